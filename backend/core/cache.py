@@ -0,0 +1,132 @@
+import os
+import re
+import json
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime
+from core.color import Logger
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+class ResponseCache(Logger):
+    """
+    Persistent cache for LLM responses backed by SQLite.
+    Keys are the SHA-256 of the model name and the full messages array, so a
+    repeated prompt is answered from disk instead of another API round-trip.
+    A second, normalized key ignores only whitespace differences so that
+    re-wrapped transcriptions also hit; case, punctuation and digits still count.
+    """
+    name = "ResponseCache"
+    color = Logger.CYAN
+
+    def __init__(self, db_file):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            db_file: Path to the SQLite file holding cached responses
+        """
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.db_file = db_file
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_file, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        # Under WAL, NORMAL only skips the fsync per commit; the database cannot corrupt
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        self.conn.commit()
+        self.log(f"Response cache ready at {db_file}")
+
+    @staticmethod
+    def make_key(model, messages):
+        """
+        Build a deterministic cache key for a request.
+        
+        Args:
+            model: Model name the request is addressed to
+            messages: Messages array sent to the LLM
+            
+        Returns:
+            str: Hex digest identifying the request
+        """
+        payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def make_near_key(model, messages):
+        """
+        Build a cache key that ignores whitespace differences only. Case, punctuation
+        and digits are kept, so e.g. "Paris" and "paris" or "3.5" and "3 5" stay distinct.
+        
+        Args:
+            model: Model name the request is addressed to
+            messages: Messages array sent to the LLM
+            
+        Returns:
+            str: Hex digest identifying the normalized request
+        """
+        normalized = [
+            {**message, "content": WHITESPACE_RE.sub(" ", message["content"]).strip()}
+            for message in messages
+        ]
+        return "near:" + ResponseCache.make_key(model, normalized)
+
+    def get(self, key):
+        """
+        Look up a cached response.
+        
+        Args:
+            key: Cache key from make_key
+            
+        Returns:
+            str | None: The cached response, or None on a miss
+        """
+        with self.lock:
+            row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get_first(self, keys):
+        """
+        Look up several keys in order and return the first cached response.
+        
+        Args:
+            keys: Cache keys, most specific first
+            
+        Returns:
+            str | None: The first cached response, or None if every key misses
+        """
+        with self.lock:
+            for key in keys:
+                row = self.conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+                if row:
+                    return row[0]
+        return None
+
+    def set(self, key, response):
+        """
+        Store a response under the given key, replacing any previous value.
+        
+        Args:
+            key: Cache key from make_key
+            response: Serialized response to store
+        """
+        self.set_many([(key, response)])
+
+    def set_many(self, entries):
+        """
+        Store several responses in a single transaction with one commit.
+        
+        Args:
+            entries: Iterable of (key, serialized response) pairs
+        """
+        created_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                [(key, response, created_at) for key, response in entries]
+            )
+            self.conn.commit()
@@ -0,0 +1,89 @@
+import os
+import json
+import threading
+from core.color import Logger
+
+# JsonlWriter and model_dump_json records are compact JSON with "id" as the first key
+ID_PREFIX = b'{"id":"'
+
+def record_id(line):
+    """
+    Read the id of a JSONL record, taking it straight from the raw bytes when the
+    line starts with a plain "id" string and decoding the whole line otherwise.
+
+    Args:
+        line: One JSONL line as bytes
+
+    Returns:
+        str | None: The record's id, if it has one
+    """
+    if line.startswith(ID_PREFIX):
+        end = line.find(b'"', len(ID_PREFIX))
+        if end != -1 and b'\\' not in line[len(ID_PREFIX):end]:
+            return line[len(ID_PREFIX):end].decode('utf-8')
+    return json.loads(line).get('id')
+
+class JsonlIndex(Logger):
+    """
+    In-memory id -> byte offset index over an append-only JSONL database.
+    Each line is read once, the first time the index reaches it; lookups then
+    seek straight to the record instead of scanning and decoding the whole file.
+    Records appended by any writer are picked up by refreshing from the last
+    indexed offset when an id is not found.
+    """
+    name = "JsonlIndex"
+    color = Logger.BLUE
+
+    def __init__(self, db_file):
+        """
+        Create an empty index for a JSONL file. Call refresh() to build it.
+
+        Args:
+            db_file: Path to the JSONL file, which may not exist yet
+        """
+        self.db_file = db_file
+        self.offsets = {}
+        self.indexed_offset = 0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """
+        Index the complete lines appended since the last refresh.
+        A trailing line without its newline is still being written and is left
+        for the next refresh.
+        """
+        with self.lock:
+            if not os.path.exists(self.db_file):
+                return
+            added = 0
+            with open(self.db_file, 'rb') as db_file:
+                db_file.seek(self.indexed_offset)
+                for line in iter(db_file.readline, b''):
+                    if not line.endswith(b'\n'):
+                        break
+                    if line.strip():
+                        line_id = record_id(line)
+                        if line_id is not None and line_id not in self.offsets:
+                            self.offsets[line_id] = self.indexed_offset
+                            added += 1
+                    self.indexed_offset += len(line)
+            if added:
+                self.log(f"Indexed {added} new records from {self.db_file} ({len(self.offsets)} total)")
+
+    def get(self, record_id):
+        """
+        Read the first record saved with an id.
+
+        Args:
+            record_id: Value of the record's "id" field
+
+        Returns:
+            dict | None: The decoded record, or None if no record has this id
+        """
+        if record_id not in self.offsets:
+            self.refresh()
+            if record_id not in self.offsets:
+                return None
+        with open(self.db_file, 'rb') as db_file:
+            db_file.seek(self.offsets[record_id])
+            return json.loads(db_file.readline())
@@ -0,0 +1,161 @@
+import os
+import json
+import time
+import queue
+import logging
+import threading
+from core.color import Logger
+
+class JsonlWriter(Logger):
+    """
+    Append-only JSONL database with group commit.
+    Records are serialized by the caller and queued; a daemon thread writes them
+    in batches, flushes each batch to the OS right away and fsyncs at most once per
+    fsync_interval, so no caller ever waits on a disk barrier.
+    A batch that fails to write is kept as an error and raised from the next
+    write(), flush() or close(), so records are never dropped silently.
+    """
+    name = "JsonlWriter"
+    color = Logger.MAGENTA
+
+    def __init__(self, db_file, batch_size=64, fsync_interval=1.0, max_queue=1024):
+        """
+        Open the database for appending and start the writer thread.
+
+        Args:
+            db_file: Path to the JSONL file
+            batch_size: Maximum records per write() call
+            fsync_interval: Seconds between fsyncs while records keep arriving
+            max_queue: Queue bound; write() blocks when the writer falls this far behind
+        """
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.file = open(db_file, 'ab', buffering=1 << 20)
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.error = None
+        self.lost_records = 0
+        self.error_lock = threading.Lock()
+        self.thread = threading.Thread(
+            target=self.writer_loop,
+            name=f"{os.path.basename(db_file)}-writer",
+            daemon=True
+        )
+        self.thread.start()
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def raise_error(self):
+        """
+        Raise, once, the error of any batch the writer thread failed to write
+        since the last check.
+
+        Raises:
+            OSError: If records were lost; chained to the original error
+        """
+        with self.error_lock:
+            error, lost = self.error, self.lost_records
+            self.error, self.lost_records = None, 0
+        if error is not None:
+            raise OSError(f"{lost} records were not written to {self.db_file}: {error}") from error
+
+    def write(self, record):
+        """
+        Serialize a record and queue it for the writer thread.
+
+        Args:
+            record: JSON-serializable dict
+
+        Raises:
+            OSError: If an earlier batch failed to write
+        """
+        self.raise_error()
+        self.queue.put((json.dumps(record, ensure_ascii=False, separators=(",", ":")) + '\n').encode('utf-8'))
+
+    def write_serialized(self, line):
+        """
+        Queue an already-serialized JSON record for the writer thread.
+
+        Args:
+            line: UTF-8 encoded JSON document without the trailing newline
+
+        Raises:
+            OSError: If an earlier batch failed to write
+        """
+        self.raise_error()
+        self.queue.put(line + b'\n')
+
+    def writer_loop(self):
+        """
+        Drain the queue on the daemon thread.
+        Writes up to batch_size records per write() call and fsyncs at most once per
+        fsync_interval. A None item stops the loop after a final fsync.
+        """
+        last_fsync = time.monotonic()
+        unsynced = False
+        stopping = False
+
+        while not stopping:
+            try:
+                batch = [self.queue.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+
+            while batch and len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            received = len(batch)
+            if None in batch:
+                stopping = True
+                batch = [record for record in batch if record is not None]
+
+            try:
+                if batch:
+                    self.file.write(b"".join(batch))
+                    self.file.flush()
+                    unsynced = True
+
+                if unsynced and (stopping or time.monotonic() - last_fsync >= self.fsync_interval):
+                    os.fsync(self.file.fileno())
+                    last_fsync = time.monotonic()
+                    unsynced = False
+            except OSError as e:
+                logging.error(f"Failed to write {len(batch)} records to {self.db_file}: {str(e)}")
+                with self.error_lock:
+                    self.error = e
+                    self.lost_records += len(batch)
+            finally:
+                for _ in range(received):
+                    self.queue.task_done()
+
+    def flush(self):
+        """
+        Block until every record queued so far has been written and flushed to the OS,
+        so it is visible to readers of the file. Does not wait for the next fsync.
+
+        Raises:
+            OSError: If any queued record failed to write
+        """
+        self.queue.join()
+        self.raise_error()
+
+    def close(self):
+        """
+        Stop the writer thread once the queue is drained, then close the file.
+
+        Raises:
+            OSError: If any queued record failed to write
+        """
+        if self.file.closed:
+            return
+        self.queue.put(None)
+        self.thread.join()
+        self.file.close()
+        self.log(f"Closed {self.db_file}")
+        self.raise_error()
@@ -1,11 +1,27 @@
 import os
+import re
+import time
+import math
+import hashlib
+import random
+import asyncio
 import logging
-from datetime import datetime
-from openai import OpenAI
-from pydantic import BaseModel, Field 
+import functools
+from collections import Counter
+import importlib.util
+import httpx
+import orjson
+from typing import List
+from types import SimpleNamespace
+from string import Formatter
+from openai import AsyncOpenAI, RateLimitError
+from pydantic import BaseModel, Field, ValidationError
 from dotenv import load_dotenv
 from core.color import Logger
-from core.prompts import SYSTEM_PROMPT, USER_PROMPT_NO_CONTEXT, USER_PROMPT_WITH_CONTEXT
+from core.cache import ResponseCache
+from core.jsonl_writer import JsonlWriter
+from core.rate_limiter import RateLimiter
+from core.prompts import SYSTEM_PROMPT, USER_PROMPT_NO_CONTEXT, USER_PROMPT_WITH_CONTEXT, USER_PROMPT_GROUPED, CHUNK_WITH_CONTEXT, CHUNK_NO_CONTEXT
 from langfuse.decorators import observe, langfuse_context
 from langfuse import Langfuse
 
@@ -14,12 +30,26 @@ logging.basicConfig(
     format='%(message)s'
 )
 
-load_dotenv(override=True)
+@functools.lru_cache(maxsize=1)
+def get_settings():
+    """
+    Load .env and read the preprocessor settings once per process, on first use.
+    
+    Returns:
+        SimpleNamespace: api_key, url, gpt, deepseek, rpm_limit, tpm_limit, db_path
+    """
+    load_dotenv(override=True)
+    return SimpleNamespace(
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        url=os.getenv("OPENROUTER_URL"),
+        gpt=os.getenv("GPT_MODEL"),
+        deepseek=os.getenv("DEEPSEEK_MODEL"),
+        rpm_limit=int(os.getenv("LLM_REQUESTS_PER_MINUTE", "500")),
+        tpm_limit=int(os.getenv("LLM_TOKENS_PER_MINUTE", "200000")),
+        db_path=os.getenv("VOXFLOW_DB_DIR", DB_PATH)
+    )
 
-api_key = os.getenv("OPENROUTER_API_KEY")
-url = os.getenv("OPENROUTER_URL")
-gpt = os.getenv("GPT_MODEL")
-deepseek = os.getenv("DEEPSEEK_MODEL")
+DB_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "databases")
 
 class PreprocessorError(Exception):
     """Base exception for preprocessor errors"""
@@ -40,10 +70,77 @@ class PreprocessedResult(BaseModel):
     preprocessed_transcription: str = Field(description="The cleaned text produced by LLM")
     timestamp: str = Field(description="Time of preprocessing")
 
+class PreprocessReport(BaseModel):
+    """Counters collected while preprocessing one transcription, filled in even if preprocessing fails."""
+    chunk_count: int = Field(default=0, description="Number of chunks the transcription was split into")
+    chunks_processed: int = Field(default=0, description="Number of chunks that ended up with cleaned text")
+    llm_retries: int = Field(default=0, description="Number of failed LLM attempts that were retried or raised")
+    output_saved: bool = Field(default=False, description="Whether the result was queued for the database")
+
 class LLMParsedResponse(BaseModel):
     """Response schema for structured output from LLM."""
     preprocessed_transcription: str = Field(description="The cleaned text")
 
+class BatchedLLMResponse(BaseModel):
+    """Response schema for several chunks cleaned in one request."""
+    cleaned: List[str] = Field(description="One cleaned text per numbered chunk, in order")
+
+def make_response_format(model):
+    """Build a strict json_schema response_format for a pydantic response model."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": model.__name__,
+            "schema": {**model.model_json_schema(), "additionalProperties": False},
+            "strict": True
+        }
+    }
+
+# Built once at import so no request re-derives the JSON schemas
+RESPONSE_FORMAT = make_response_format(LLMParsedResponse)
+GROUPED_RESPONSE_FORMAT = make_response_format(BatchedLLMResponse)
+
+BATCH_TERMINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+WHITESPACE_RE = re.compile(r"\s+")
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?]) ")
+CHARS_PER_TOKEN = 4
+
+def char_entropy(text):
+    """Shannon entropy (bits per character) of the character histogram of text."""
+    total = len(text)
+    return -sum(count / total * math.log2(count / total) for count in Counter(text).values()) if total else 0.0
+
+def estimate_tokens(text):
+    """Rough token count for English text (about 4 characters per token)."""
+    return len(text) // CHARS_PER_TOKEN
+
+def compile_template(template):
+    """
+    Parse a str.format template once into (literal, field) pairs so it can be
+    rendered repeatedly without re-parsing the placeholders.
+    
+    Args:
+        template: Template string with plain {field} placeholders
+        
+    Returns:
+        list: (literal, field_name) tuples; field_name is None after the last literal
+    """
+    return [(literal, field) for literal, field, _, _ in Formatter().parse(template)]
+
+def render_template(parts, **values):
+    """
+    Render a template compiled with compile_template.
+    
+    Args:
+        parts: Output of compile_template
+        **values: Values for each field in the template
+        
+    Returns:
+        str: The rendered text
+    """
+    return "".join(literal + values[field] if field is not None else literal for literal, field in parts)
+
 class Preprocessor(Logger):
     name = "Preprocessor"
     color = Logger.GREEN 
@@ -51,31 +148,59 @@ class Preprocessor(Logger):
     def __init__(self):
         """
         Initialize the Preprocessor with OpenAI client, Langfuse observability, and prompts.
-        Sets up connection to OpenRouter API and Langfuse for tracking.
+        Sets up connection to OpenRouter API and Langfuse for tracking, opens the
+        preprocessings database through a group-commit JsonlWriter.
         """
         try:
-            if not api_key or not url:
+            self.settings = get_settings()
+            if not self.settings.api_key or not self.settings.url:
                 raise ValueError("Missing OPENROUTER_API_KEY or OPENROUTER_URL in environment")
             
-            self.client = OpenAI(api_key=api_key, base_url=url)
+            self.client = AsyncOpenAI(
+                api_key=self.settings.api_key,
+                base_url=self.settings.url,
+                http_client=httpx.AsyncClient(
+                    http2=importlib.util.find_spec("h2") is not None,
+                    limits=httpx.Limits(max_connections=200, max_keepalive_connections=50, keepalive_expiry=30.0),
+                    timeout=httpx.Timeout(60.0, connect=5.0)
+                )
+            )
             self.langfuse = Langfuse(
                 secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
                 public_key=os.getenv("LANGFUSE_PUBLIC_KEY"),
                 host=os.getenv("LANGFUSE_HOST")
             )
-            self.model = gpt 
+            self.model = self.settings.gpt
+            self.max_concurrency = 8
+            self.retry_base_delay = 1.0
+            self.batch_poll_interval = 30
+            self.batch_max_poll_interval = 600
+            self.context_words = 200
+            self.skipped_chunks = 0
+            self.cache = ResponseCache(os.path.join(self.settings.db_path, "llm_cache.sqlite"))
+            self.rate_limiter = RateLimiter(rpm=self.settings.rpm_limit, tpm=self.settings.tpm_limit, max_concurrency=self.max_concurrency)
             self.system_prompt = SYSTEM_PROMPT
-            self.user_prompt_with_context = USER_PROMPT_WITH_CONTEXT
-            self.user_prompt_no_context = USER_PROMPT_NO_CONTEXT
+            self.system_message = {"role": "system", "content": self.system_prompt}
+            self.instructions_with_context = {"role": "user", "content": USER_PROMPT_WITH_CONTEXT}
+            self.instructions_no_context = {"role": "user", "content": USER_PROMPT_NO_CONTEXT}
+            self.instructions_grouped = {"role": "user", "content": USER_PROMPT_GROUPED}
+            self.chunks_per_request = 5
+            self.max_group_tokens = 6000
+            self.chunk_with_context = compile_template(CHUNK_WITH_CONTEXT)
+            self.chunk_no_context = compile_template(CHUNK_NO_CONTEXT)
+            os.makedirs(self.settings.db_path, exist_ok=True)
+            self.db_file = os.path.join(self.settings.db_path, "preprocessings.jsonl")
+            self.db = JsonlWriter(self.db_file)
             self.log("Initialized Preprocessor")
         except Exception as e:
             logging.error(f"Failed to initialize Preprocessor: {str(e)}")
             raise
 
-    @observe(name="save-preprocessed", as_type="span")
+    @observe(name="save-preprocessed", as_type="span", capture_input=False, capture_output=False)
     def save_preprocessed(self, session_id, audio_name, clean_text):
         """
         Save the preprocessed transcription to JSONL database.
+        The record is handed to the background writer, so the caller never waits on disk I/O.
         
         Args:
             session_id: Unique identifier matching the original transcription
@@ -86,26 +211,20 @@ class Preprocessor(Logger):
             PreprocessedResult: The saved result object with metadata
             
         Raises:
-            DatabaseError: If file operations fail
+            DatabaseError: If the record cannot be serialized or queued
         """
         try:
-            db_path = r"D:\Projects\audio_preprocessor\backend\databases"
-            jsonl_file = os.path.join(db_path, "preprocessings.jsonl")
-            os.makedirs(db_path, exist_ok=True)
+            record = {
+                "id": session_id,
+                "name": audio_name,
+                "preprocessed_transcription": clean_text,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+            }
             
-            result_obj = PreprocessedResult(
-                id=session_id,
-                name=audio_name,
-                preprocessed_transcription=clean_text,
-                timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            )
+            self.db.write_serialized(orjson.dumps(record))
+            result_obj = PreprocessedResult.model_construct(**record)
             
-            with open(jsonl_file, 'a', encoding='utf-8') as f:
-                f.write(result_obj.model_dump_json() + '\n')
-                f.flush()
-                os.fsync(f.fileno())
-                
-            self.log(f"Cleaned text for {audio_name} saved to {jsonl_file}")
+            self.log(f"Cleaned text for {audio_name} queued for {self.db_file}")
             self.log(f"the length of cleaned text: {len(clean_text)} characters")
             return result_obj
         except Exception as e:
@@ -113,55 +232,141 @@ class Preprocessor(Logger):
             self.log(error_msg)
             raise DatabaseError(error_msg) from e
 
-    @observe(name="make-messages", as_type="span")
+    def parse_input(self, input_data):
+        """
+        Extract the transcription text, session ID and audio name from an input.
+        
+        Args:
+            input_data: Dict or object containing transcription, id, and name
+            
+        Returns:
+            tuple: (raw_text, session_id, audio_name)
+            
+        Raises:
+            ValueError: If transcription or id is missing
+        """
+        if isinstance(input_data, dict):
+            raw_text = input_data.get("transcription", "")
+            session_id = input_data.get("id", "")
+            audio_name = input_data.get("name", "")
+        else:
+            raw_text = input_data.transcription
+            session_id = input_data.id
+            audio_name = input_data.name
+
+        if not raw_text or not session_id:
+            raise ValueError("Missing required fields: transcription or id")
+
+        return raw_text, session_id, audio_name
+
+    def close(self):
+        """
+        Drain pending records and close the database.
+        Call on shutdown so every saved record is fsynced to disk.
+        """
+        self.db.close()
+
+    def is_already_clean(self, chunk):
+        """
+        Check whether a chunk can skip the LLM: it is empty, very short, a
+        transcription error marker or low-entropy noise (repeated characters).
+        Anything else may still need grammar, punctuation or casing fixes.
+        
+        Args:
+            chunk: Raw text chunk
+            
+        Returns:
+            bool: True if the chunk can be used as-is
+        """
+        stripped = chunk.strip()
+        if len(stripped) >= 40 and not stripped.startswith("[Error") and char_entropy(stripped) >= 2.0:
+            return False
+        
+        self.skipped_chunks += 1
+        self.log(f"Chunk is empty, too short or noise, skipping LLM call (skipped so far: {self.skipped_chunks})")
+        return True
+
     def make_messages(self, previous_chunk, current_chunk):
         """
         Construct the messages array for LLM with appropriate context.
+        The system prompt and instructions are identical across calls and come first,
+        so the provider can reuse its prompt-prefix cache; only the final message varies.
+        The previous chunk is cut down to its last context_words words.
         
         Args:
-            previous_chunk: Previously cleaned text for context (empty string if first chunk)
+            previous_chunk: Preceding raw chunk for context (empty string if first chunk)
             current_chunk: Current text chunk to be cleaned
             
         Returns:
-            list: Messages array with system and user prompts
+            list: Messages array with system prompt, static instructions and chunk text
         """
         if previous_chunk:
-            user_content = self.user_prompt_with_context.format(
-                previous_chunk=previous_chunk,
+            context = " ".join(previous_chunk.rsplit(" ", self.context_words)[-self.context_words:])
+            instructions = self.instructions_with_context
+            chunk_content = render_template(
+                self.chunk_with_context,
+                previous_chunk=context,
                 current_chunk=current_chunk
             )
         else:
-            user_content = self.user_prompt_no_context.format(
+            instructions = self.instructions_no_context
+            chunk_content = render_template(
+                self.chunk_no_context,
                 current_chunk=current_chunk
             )
         
         return [
-            {"role": "system", "content": self.system_prompt},
-            {"role": "user", "content": user_content}
+            self.system_message,
+            instructions,
+            {"role": "user", "content": chunk_content}
+        ]
+
+    def make_group_messages(self, previous_chunk, group):
+        """
+        Construct the messages array for cleaning several chunks in one request.
+        Chunks are wrapped in numbered <CHUNK i> blocks after the static instructions.
+        
+        Args:
+            previous_chunk: Raw chunk preceding the group (empty string if none)
+            group: List of raw text chunks to clean together
+            
+        Returns:
+            list: Messages array with system prompt, grouped instructions and chunk blocks
+        """
+        parts = []
+        if previous_chunk:
+            context = " ".join(previous_chunk.rsplit(" ", self.context_words)[-self.context_words:])
+            parts.append(f"PREVIOUS:\n{context}\n")
+        for number, chunk in enumerate(group, start=1):
+            parts.append(f"<CHUNK {number}>\n{chunk}\n</CHUNK {number}>")
+        
+        return [
+            self.system_message,
+            self.instructions_grouped,
+            {"role": "user", "content": "\n".join(parts)}
         ]
 
-    @observe(name="chunk-transcription", as_type="span")
     def chunk_transcription(self, transcription, chunk_size):
         """
         Split long transcription into smaller chunks at sentence boundaries.
         
         Args:
             transcription: Full transcription text to be chunked
-            chunk_size: Maximum character count per chunk
+            chunk_size: Maximum estimated token count per chunk
             
         Returns:
             list: List of text chunks split at sentence boundaries
         """
-        words = transcription.split()
+        text = WHITESPACE_RE.sub(" ", transcription).strip()
         chunks = []
         current_chunk = []
         current_length = 0
         
-        for word in words:
-            current_chunk.append(word)
-            current_length += len(word) + 1  
+        for sentence in SENTENCE_BOUNDARY_RE.split(text):
+            current_chunk.append(sentence)
+            current_length += estimate_tokens(sentence)
             
-            if current_length >= chunk_size and word[-1] in '.!?':
+            if current_length >= chunk_size:
                 chunks.append(' '.join(current_chunk))
                 current_chunk = []
                 current_length = 0
@@ -172,36 +377,78 @@ class Preprocessor(Logger):
         self.log(f"Split transcription into {len(chunks)} chunks")
         return chunks
 
-    @observe(name="call-llm-engine", as_type="generation")
-    def call_llm(self, messages, chunk_idx=None):
+    @staticmethod
+    def response_content(parsed):
+        """Extract the cleaned text (or list of texts) from a parsed LLM response."""
+        if isinstance(parsed, BatchedLLMResponse):
+            return parsed.cleaned
+        return parsed.preprocessed_transcription
+
+    @observe(name="call-llm-engine", as_type="generation", capture_input=False, capture_output=False)
+    async def call_llm(self, messages, chunk_idx=None, grouped=False, report=None):
         """
-        Call the LLM to clean transcription text with structured output parsing.
-        Tries deepseek first, then falls back to GPT for 2 retries.
+        Call the LLM to clean transcription text with strict JSON-schema output.
+        Identical and near-identical requests are answered from the persistent response cache.
+        Otherwise tries deepseek first, then falls back to GPT for 2 retries with
+        exponential backoff and jitter between attempts. Every attempt goes through
+        the shared rate limiter, which pauses and lowers concurrency on 429s.
         
         Args:
             messages: Array of message objects for the LLM
             chunk_idx: Optional chunk number for tracking in metadata
+            grouped: Messages come from make_group_messages and expect a BatchedLLMResponse
+            report: Optional PreprocessReport whose llm_retries counts failed attempts
             
         Returns:
-            str: The cleaned transcription text
+            str | list: The cleaned transcription text, or one text per chunk if grouped
             
         Raises:
             LLMCallError: If all 3 attempts fail
         """
+        response_model = BatchedLLMResponse if grouped else LLMParsedResponse
+        response_format = GROUPED_RESPONSE_FORMAT if grouped else RESPONSE_FORMAT
+        
+        cache_key = self.cache.make_key(self.model, messages)
+        near_key = self.cache.make_near_key(self.model, messages)
+        # SQLite calls block, so they run off the event loop
+        cached = await asyncio.to_thread(self.cache.get_first, (cache_key, near_key))
+        if cached is not None:
+            content = self.response_content(response_model.model_validate_json(cached))
+            langfuse_context.update_current_observation(
+                input=messages,
+                output=content,
+                metadata={"chunk_index": chunk_idx, "cache_hit": True}
+            )
+            self.log(f"Cache hit for chunk {chunk_idx or 1}, skipping LLM call")
+            return content
+
+        estimated_tokens = sum(estimate_tokens(message["content"]) for message in messages)
+
         for attempt in range(3):
-            model = deepseek if attempt == 0 else gpt
+            model = self.settings.deepseek if attempt == 0 else self.settings.gpt
             
+            await self.rate_limiter.acquire(estimated_tokens)
+            succeeded = False
             try:
                 langfuse_context.update_current_observation(model=model, input=messages)
                 
-                response = self.client.chat.completions.parse(
+                response = await self.client.chat.completions.create(
                     model=model,
                     messages=messages,
-                    response_format=LLMParsedResponse
+                    response_format=response_format
                 )
                 
-                parsed_obj = getattr(response.choices[0].message, 'parsed', None)
-                content = parsed_obj.preprocessed_transcription if parsed_obj else response.choices[0].message.content
+                message = response.choices[0].message
+                validated = True
+                try:
+                    parsed = response_model.model_validate_json(message.content)
+                except ValidationError:
+                    if grouped:
+                        raise
+                    # Use the raw content this once, but never cache it so later calls retry
+                    validated = False
+                    parsed = LLMParsedResponse(preprocessed_transcription=message.content)
+                content = self.response_content(parsed)
                 
                 if response.usage:
                     input_cost = float(response.usage.cost_details.get('upstream_inference_prompt_cost') or 0.0)
@@ -232,25 +479,136 @@ class Preprocessor(Logger):
                         }
                     )
                     
-                    self.log(f"Model: {model} | Tokens: {response.usage.total_tokens} | Cost: ${total_cost:.8f}")
+                    self.log(f"Model: {model} | Tokens: {response.usage.total_tokens} (cached prompt: {cached_tokens}) | Cost: ${total_cost:.8f}")
                 
+                if validated:
+                    serialized = parsed.model_dump_json()
+                    await asyncio.to_thread(self.cache.set_many, [(cache_key, serialized), (near_key, serialized)])
+                succeeded = True
                 return content
                 
+            except RateLimitError as e:
+                self.log(f"Attempt {attempt + 1}/3 failed with {model}: {str(e)}")
+                if report is not None:
+                    report.llm_retries += 1
+                if attempt == 2:
+                    raise LLMCallError(f"All 3 attempts failed: {str(e)}") from e
+                delay = self.retry_base_delay * (2 ** attempt)
+                try:
+                    retry_after = float(e.response.headers.get("retry-after", delay))
+                except ValueError:
+                    retry_after = delay
+                await self.rate_limiter.on_rate_limit(retry_after)
             except Exception as e:
                 self.log(f"Attempt {attempt + 1}/3 failed with {model}: {str(e)}")
+                if report is not None:
+                    report.llm_retries += 1
                 if attempt == 2:
                     raise LLMCallError(f"All 3 attempts failed: {str(e)}") from e
+                delay = self.retry_base_delay * (2 ** attempt) + random.uniform(0, self.retry_base_delay)
+                await asyncio.sleep(delay)
+            finally:
+                await self.rate_limiter.release(success=succeeded)
+
+    @observe(name="process-chunks-parallel", as_type="span", capture_input=False, capture_output=False)
+    async def process_chunks_parallel(self, chunks, report=None):
+        """
+        Clean all chunks concurrently; the shared rate limiter bounds how many
+        requests are in flight and keeps them under the RPM/TPM budgets.
+        Each request gets the preceding raw chunk as context so no call has to wait
+        for another one to finish. Chunks that need cleaning are sent in groups of
+        up to chunks_per_request (and max_group_tokens) consecutive chunks per request
+        to amortize the prompt and per-request overhead; a group whose request fails
+        is cleaned chunk by chunk. Identical chunks are only cleaned once.
+        
+        Args:
+            chunks: List of raw text chunks
+            report: Optional PreprocessReport passed on to call_llm
+            
+        Returns:
+            list: Cleaned chunks in their original order
+        """
+        async def clean_chunk(idx, chunk):
+            self.log(f"Processing chunk {idx + 1}/{len(chunks)}")
+            previous_chunk = chunks[idx - 1] if idx > 0 else ""
+            return await self.call_llm(
+                self.make_messages(previous_chunk, chunk),
+                chunk_idx=idx + 1,
+                report=report
+            )
 
-    @observe(name="audio-preprocessing")
-    def preprocess(self, input_data, chunk_size=2000):
+        async def clean_group(indices):
+            if len(indices) == 1:
+                return [await clean_chunk(indices[0], chunks[indices[0]])]
+            
+            self.log(f"Processing chunks {', '.join(str(idx + 1) for idx in indices)}/{len(chunks)} in one request")
+            first = indices[0]
+            previous_chunk = chunks[first - 1] if first > 0 else ""
+            try:
+                cleaned = await self.call_llm(
+                    self.make_group_messages(previous_chunk, [chunks[idx] for idx in indices]),
+                    chunk_idx=first + 1,
+                    grouped=True,
+                    report=report
+                )
+            except (LLMCallError, ValidationError) as e:
+                self.log(f"Grouped request failed for chunks {', '.join(str(idx + 1) for idx in indices)}: {str(e)}, cleaning them one by one")
+            else:
+                if len(cleaned) == len(indices):
+                    return cleaned
+                self.log(f"Grouped response returned {len(cleaned)} texts for {len(indices)} chunks, cleaning them one by one")
+            return await asyncio.gather(*(clean_chunk(idx, chunks[idx]) for idx in indices))
+
+        results = [None] * len(chunks)
+        pending = []
+        seen = {}
+        duplicates = {}
+        for idx, chunk in enumerate(chunks):
+            if self.is_already_clean(chunk):
+                results[idx] = chunk.strip()
+                continue
+            digest = hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).digest()
+            if digest in seen:
+                duplicates[idx] = seen[digest]
+            else:
+                seen[digest] = idx
+                pending.append(idx)
+        
+        if duplicates:
+            self.log(f"Reusing cleaned text for {len(duplicates)} duplicate chunks")
+        
+        groups = []
+        group_tokens = 0
+        for idx in pending:
+            tokens = estimate_tokens(chunks[idx])
+            # Only the chunk before a group's first index is sent as context, so groups stay consecutive
+            if (not groups or idx != groups[-1][-1] + 1 or len(groups[-1]) >= self.chunks_per_request
+                    or group_tokens + tokens > self.max_group_tokens):
+                groups.append([])
+                group_tokens = 0
+            groups[-1].append(idx)
+            group_tokens += tokens
+        for indices, cleaned in zip(groups, await asyncio.gather(*(clean_group(indices) for indices in groups))):
+            for idx, text in zip(indices, cleaned):
+                results[idx] = text
+        for idx, original in duplicates.items():
+            results[idx] = results[original]
+        
+        return results
+
+    @observe(name="audio-preprocessing", capture_input=False, capture_output=False)
+    async def preprocess(self, input_data, chunk_size=3000, report=None):
         """
         Main preprocessing workflow that cleans raw transcription text using LLM.
-        Automatically chunks long texts and maintains context between chunks.
+        Automatically chunks long texts and cleans the chunks concurrently, giving
+        each one its preceding raw chunk as context.
         Creates a Langfuse trace with session tracking and scores the result.
         
         Args:
             input_data: Dict or object containing transcription, id, and name
-            chunk_size: Maximum characters per chunk (default 2000)
+            chunk_size: Maximum estimated tokens per chunk (default 3000)
+            report: Optional PreprocessReport that is filled in as the transcription is processed,
+                so callers can inspect chunk counts and retries even when this raises
             
         Returns:
             PreprocessedResult: The final cleaned result saved to database
@@ -258,18 +616,9 @@ class Preprocessor(Logger):
         Raises:
             PreprocessorError: If preprocessing fails at any stage
         """
+        report = report if report is not None else PreprocessReport()
         try:
-            if isinstance(input_data, dict):
-                raw_text = input_data.get("transcription", "")
-                session_id = input_data.get("id", "")
-                audio_name = input_data.get("name", "")
-            else:
-                raw_text = input_data.transcription
-                session_id = input_data.id
-                audio_name = input_data.name
-
-            if not raw_text or not session_id:
-                raise ValueError("Missing required fields: transcription or id")
+            raw_text, session_id, audio_name = self.parse_input(input_data)
 
             langfuse_context.update_current_trace(
                 session_id=session_id,
@@ -277,6 +626,7 @@ class Preprocessor(Logger):
                 metadata={
                     "audio_name": audio_name,
                     "transcription_length": len(raw_text),
+                    "estimated_tokens": estimate_tokens(raw_text),
                     "chunk_size": chunk_size
                 }
             )
@@ -284,26 +634,23 @@ class Preprocessor(Logger):
             self.log(f"Starting preprocessing for ID: {session_id}")
             self.log(f"Transcription length: {len(raw_text)} characters")
 
-            if len(raw_text) <= chunk_size:
+            if estimate_tokens(raw_text) <= chunk_size:
                 self.log("Processing in single pass...")
-                final_combined_text = self.call_llm(self.make_messages("", raw_text))
+                report.chunk_count = 1
+                if self.is_already_clean(raw_text):
+                    final_combined_text = raw_text.strip()
+                else:
+                    final_combined_text = await self.call_llm(self.make_messages("", raw_text), report=report)
+                report.chunks_processed = 1
             else:
                 chunks = self.chunk_transcription(raw_text, chunk_size)
-                preprocessed_chunks = []
-                previous_preprocessed = ""
-                
-                for idx, chunk in enumerate(chunks):
-                    self.log(f"Processing chunk {idx + 1}/{len(chunks)}")
-                    current_clean = self.call_llm(
-                        self.make_messages(previous_preprocessed, chunk),
-                        chunk_idx=idx + 1
-                    )
-                    preprocessed_chunks.append(current_clean)
-                    previous_preprocessed = current_clean
-                
+                report.chunk_count = len(chunks)
+                preprocessed_chunks = await self.process_chunks_parallel(chunks, report)
+                report.chunks_processed = sum(chunk is not None for chunk in preprocessed_chunks)
                 final_combined_text = " ".join(preprocessed_chunks)
 
             result = self.save_preprocessed(session_id, audio_name, final_combined_text)
+            report.output_saved = True
             
             self.langfuse.score(
                 trace_id=langfuse_context.get_current_trace_id(),
@@ -334,6 +681,181 @@ class Preprocessor(Logger):
             )
             raise PreprocessorError(error_msg) from e
 
+    async def wait_for_batch(self, batch_id):
+        """
+        Poll a Batch API job with exponential backoff until it reaches a terminal status.
+        
+        Args:
+            batch_id: ID of the batch job to poll
+            
+        Returns:
+            Batch: The finished batch object
+            
+        Raises:
+            LLMCallError: If the batch does not complete successfully
+        """
+        delay = self.batch_poll_interval
+        batch = await self.client.batches.retrieve(batch_id)
+        
+        while batch.status not in BATCH_TERMINAL_STATUSES:
+            self.log(f"Batch {batch_id} is {batch.status}, checking again in {delay}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.batch_max_poll_interval)
+            batch = await self.client.batches.retrieve(batch_id)
+        
+        if batch.status != "completed" or not batch.output_file_id:
+            raise LLMCallError(f"Batch {batch_id} finished with status '{batch.status}'")
+        
+        return batch
+
+    async def run_batch(self, batch_lines, cleaned):
+        """
+        Upload batch requests, wait for the job and collect the cleaned chunks.
+        Successful outputs are also written to the response cache; failed or
+        unparseable ones are left out of cleaned for the caller to retry.
+        
+        Args:
+            batch_lines: Batch API request lines as UTF-8 encoded JSON
+            cleaned: Dict mapping custom_id to cleaned text, updated in place
+            
+        Returns:
+            str: ID of the finished batch job
+        """
+        cache_keys = {}
+        for line in batch_lines:
+            request = orjson.loads(line)
+            messages = request["body"]["messages"]
+            cache_keys[request["custom_id"]] = (
+                self.cache.make_key(self.model, messages),
+                self.cache.make_near_key(self.model, messages)
+            )
+
+        batch_file = await self.client.files.create(
+            file=("preprocessing_batch.jsonl", b"\n".join(batch_lines)),
+            purpose="batch"
+        )
+        batch = await self.client.batches.create(
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h"
+        )
+        self.log(f"Submitted batch {batch.id} with {len(batch_lines)} requests")
+        
+        batch = await self.wait_for_batch(batch.id)
+        output = await self.client.files.content(batch.output_file_id)
+        
+        cache_entries = []
+        for line in output.content.splitlines():
+            if not line.strip():
+                continue
+            record = orjson.loads(line)
+            response = record.get("response") or {}
+            if record.get("error") or response.get("status_code") != 200:
+                self.log(f"Batch request {record.get('custom_id')} failed: {record.get('error')}")
+                continue
+            content = response["body"]["choices"][0]["message"]["content"]
+            try:
+                parsed = LLMParsedResponse.model_validate_json(content)
+            except ValidationError as e:
+                # Left out of cleaned so preprocess_batch retries it through the realtime call
+                self.log(f"Batch request {record.get('custom_id')} returned invalid output: {str(e)}")
+                continue
+            cleaned[record["custom_id"]] = parsed.preprocessed_transcription
+            serialized = parsed.model_dump_json()
+            cache_entries.extend((key, serialized) for key in cache_keys[record["custom_id"]])
+        
+        await asyncio.to_thread(self.cache.set_many, cache_entries)
+        return batch.id
+
+    @observe(name="audio-preprocessing-batch", capture_input=False, capture_output=False)
+    async def preprocess_batch(self, inputs, chunk_size=3000, realtime=False):
+        """
+        Preprocess many transcriptions through the OpenAI Batch API.
+        Every chunk of every input becomes one line of a JSONL batch file keyed by
+        "<session_id>:<chunk_idx>". Batch jobs cost half as much and draw from a
+        separate rate-limit pool, but may take up to 24h, so this path is meant for
+        non-interactive bulk runs. Chunks missing from the batch output are retried
+        through the regular realtime call.
+        
+        Args:
+            inputs: List of dicts or objects containing transcription, id, and name
+            chunk_size: Maximum estimated tokens per chunk (default 3000)
+            realtime: Skip the Batch API and preprocess each input directly
+            
+        Returns:
+            list: PreprocessedResult objects in the same order as inputs
+            
+        Raises:
+            PreprocessorError: If batch preprocessing fails at any stage
+        """
+        if realtime or len(inputs) == 1:
+            return [await self.preprocess(input_data, chunk_size) for input_data in inputs]
+        
+        try:
+            jobs = []
+            requests = {}
+            cleaned = {}
+            
+            for input_data in inputs:
+                raw_text, session_id, audio_name = self.parse_input(input_data)
+                chunks = [raw_text] if estimate_tokens(raw_text) <= chunk_size else self.chunk_transcription(raw_text, chunk_size)
+                jobs.append((session_id, audio_name, chunks))
+                
+                for idx, chunk in enumerate(chunks):
+                    if self.is_already_clean(chunk):
+                        cleaned[f"{session_id}:{idx}"] = chunk.strip()
+                        continue
+                    previous_chunk = chunks[idx - 1] if idx > 0 else ""
+                    messages = self.make_messages(previous_chunk, chunk)
+                    cached = await asyncio.to_thread(self.cache.get_first, (
+                        self.cache.make_key(self.model, messages),
+                        self.cache.make_near_key(self.model, messages)
+                    ))
+                    if cached is not None:
+                        cleaned[f"{session_id}:{idx}"] = LLMParsedResponse.model_validate_json(cached).preprocessed_transcription
+                    requests[f"{session_id}:{idx}"] = messages
+
+            langfuse_context.update_current_trace(
+                tags=["preprocessing", "batch"],
+                metadata={"total_inputs": len(jobs), "total_requests": len(requests), "chunk_size": chunk_size}
+            )
+
+            batch_lines = [
+                orjson.dumps({
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": "/v1/chat/completions",
+                    "body": {"model": self.model, "messages": messages, "response_format": RESPONSE_FORMAT}
+                })
+                for custom_id, messages in requests.items()
+                if custom_id not in cleaned
+            ]
+            
+            batch_id = await self.run_batch(batch_lines, cleaned) if batch_lines else None
+
+            results = []
+            for session_id, audio_name, chunks in jobs:
+                preprocessed_chunks = []
+                for idx in range(len(chunks)):
+                    custom_id = f"{session_id}:{idx}"
+                    if custom_id not in cleaned:
+                        self.log(f"Missing batch output for {custom_id}, falling back to realtime call")
+                        cleaned[custom_id] = await self.call_llm(requests[custom_id], chunk_idx=idx + 1)
+                    preprocessed_chunks.append(cleaned[custom_id])
+                
+                results.append(self.save_preprocessed(session_id, audio_name, " ".join(preprocessed_chunks)))
+            
+            self.log(f"Batch {batch_id or '(fully cached)'} completed: {len(results)} transcriptions preprocessed")
+            return results
+            
+        except (LLMCallError, DatabaseError) as e:
+            self.log(f"Batch preprocessing failed: {str(e)}")
+            raise
+        except Exception as e:
+            error_msg = f"Unexpected error during batch preprocessing: {str(e)}"
+            self.log(error_msg)
+            raise PreprocessorError(error_msg) from e
+
 if __name__ == "__main__":
     preprocessor = Preprocessor()
     
@@ -353,7 +875,7 @@ Also, um, in terms of the interface, I was thinking that the user could either u
     }
     
     try:
-        final_result = preprocessor.preprocess(test_input)
+        final_result = asyncio.run(preprocessor.preprocess(test_input))
         
         print("\n" + "="*40)
         print("FINAL PREPROCESSED OBJECT")
@@ -362,5 +884,6 @@ Also, um, in terms of the interface, I was thinking that the user could either u
     except PreprocessorError as e:
         print(f"\nPreprocessing failed: {str(e)}")
     finally:
+        preprocessor.close()
         preprocessor.langfuse.flush()
         print("\nLangfuse traces flushed.")
\ No newline at end of file
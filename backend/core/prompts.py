@@ -14,7 +14,7 @@ PROCESSING GUIDELINES:
 - Improve readability while keeping the structure faithful to the original speech.
 - Rewrite only where clarity or coherence is improved.
 - Ensure grammatical correctness and logical progression.
-- **IMPORTANT: When provided with a previous preprocessed chunk, maintain EXACT consistency in tone, style, formality, and writing patterns.**
+- **IMPORTANT: When provided with the previous raw chunk, use it only as context for continuity (pronouns, topic, tone). Never include it in the output.**
 - Output raw JSON only.
 - Do not use Markdown.
 - Do not wrap the response in code fences.
@@ -33,20 +33,33 @@ OUTPUT SCHEMA:
 """
 
 USER_PROMPT_WITH_CONTEXT = """
-PREVIOUS PREPROCESSED CHUNK (for context and consistency):
-{previous_chunk}
-
----
-
-CURRENT RAW TRANSCRIPTION CHUNK (to preprocess):
-{current_chunk}
+The next message contains two raw transcription chunks:
+- PREVIOUS: the preceding raw chunk, for context only. Do not preprocess it or include it in the output.
+- CURRENT: the raw chunk to preprocess.
 
-Please preprocess the current chunk while maintaining EXACT consistency with the previous chunk's tone, style, formality, and sentence structure.
+Please preprocess only the current chunk, using the previous chunk as context so that references and flow stay coherent.
 """
 
 USER_PROMPT_NO_CONTEXT = """
-RAW TRANSCRIPTION CHUNK (to preprocess):
-{current_chunk}
+The next message contains a raw transcription chunk.
 
 Please preprocess this transcription.
-"""
\ No newline at end of file
+"""
+
+USER_PROMPT_GROUPED = """
+The next message contains several raw transcription chunks in numbered <CHUNK i> blocks,
+optionally preceded by a PREVIOUS raw chunk that is for context only.
+
+Preprocess every chunk separately and return a JSON object with exactly one key, "cleaned":
+an array holding one cleaned string per <CHUNK i> block, in the same order.
+This replaces the single-key output schema above for this request.
+"""
+
+CHUNK_WITH_CONTEXT = """PREVIOUS:
+{previous_chunk}
+
+CURRENT:
+{current_chunk}"""
+
+CHUNK_NO_CONTEXT = """CURRENT:
+{current_chunk}"""
@@ -0,0 +1,97 @@
+import time
+import asyncio
+from core.color import Logger
+
+class RateLimiter(Logger):
+    """
+    Async limiter for LLM calls that respects requests-per-minute, tokens-per-minute
+    and an adaptive cap on in-flight requests.
+    Both per-minute budgets are leaky buckets refilled continuously. When the
+    provider answers with a rate-limit error, concurrency is halved and all callers
+    pause for the Retry-After period; every successful call then raises the cap by
+    one again until it is back at max_concurrency.
+    """
+    name = "RateLimiter"
+    color = Logger.RED
+
+    def __init__(self, rpm, tpm, max_concurrency):
+        """
+        Args:
+            rpm: Requests allowed per minute
+            tpm: Tokens allowed per minute
+            max_concurrency: Upper bound on simultaneous in-flight requests
+        """
+        self.rpm = rpm
+        self.tpm = tpm
+        self.max_concurrency = max_concurrency
+        self.concurrency = max_concurrency
+        self.available_requests = float(rpm)
+        self.available_tokens = float(tpm)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_refill = time.monotonic()
+        self.condition = asyncio.Condition()
+
+    def refill(self):
+        """Top up both buckets for the time elapsed since the last refill."""
+        now = time.monotonic()
+        elapsed = now - self.last_refill
+        self.last_refill = now
+        self.available_requests = min(self.rpm, self.available_requests + elapsed * self.rpm / 60)
+        self.available_tokens = min(self.tpm, self.available_tokens + elapsed * self.tpm / 60)
+
+    async def acquire(self, estimated_tokens):
+        """
+        Wait until a request slot, enough token budget and a concurrency slot are free.
+        
+        Args:
+            estimated_tokens: Rough token count of the request about to be sent
+        """
+        estimated_tokens = min(estimated_tokens, self.tpm)
+        
+        async with self.condition:
+            while True:
+                self.refill()
+                wait = self.paused_until - time.monotonic()
+                
+                if (wait <= 0 and self.in_flight < self.concurrency
+                        and self.available_requests >= 1 and self.available_tokens >= estimated_tokens):
+                    self.available_requests -= 1
+                    self.available_tokens -= estimated_tokens
+                    self.in_flight += 1
+                    return
+                
+                request_wait = (1 - self.available_requests) * 60 / self.rpm
+                token_wait = (estimated_tokens - self.available_tokens) * 60 / self.tpm
+                wait = max(wait, request_wait, token_wait, 0.05)
+                
+                try:
+                    await asyncio.wait_for(self.condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, success=True):
+        """
+        Free the concurrency slot taken by acquire.
+        
+        Args:
+            success: Whether the call succeeded; successes grow concurrency back by one
+        """
+        async with self.condition:
+            self.in_flight -= 1
+            if success and self.concurrency < self.max_concurrency:
+                self.concurrency += 1
+            self.condition.notify_all()
+
+    async def on_rate_limit(self, retry_after):
+        """
+        Back off after a rate-limit response from the provider.
+        
+        Args:
+            retry_after: Seconds to pause all callers, usually from the Retry-After header
+        """
+        async with self.condition:
+            self.concurrency = max(1, self.concurrency // 2)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            self.log(f"Rate limited, concurrency lowered to {self.concurrency}, pausing {retry_after:.1f}s")
+            self.condition.notify_all()
@@ -1,17 +1,22 @@
+import io
 import os
-import threading
+import time
 import uuid
+import random
+import hashlib
 import logging
-from datetime import datetime
-from tempfile import TemporaryDirectory
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
 
-import whisper
-from pydub import AudioSegment
+import orjson
+import ctranslate2
+from faster_whisper import WhisperModel, BatchedInferencePipeline, decode_audio
+from typing import List
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
 from core.color import Logger
+from core.cache import ResponseCache
+from core.jsonl_writer import JsonlWriter
 from langfuse.decorators import observe, langfuse_context
 from langfuse import Langfuse
 
@@ -23,6 +28,35 @@ logging.basicConfig(
 load_dotenv(override=True)
 
 MODEL = "small"
+DB_PATH = os.getenv("VOXFLOW_DB_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "databases"))
+
+MODEL_CACHE = {}
+MODEL_CACHE_LOCK = threading.Lock()
+
+def load_whisper(device, compute_type, cpu_threads):
+    """
+    Load the Whisper model once per (model, device, compute type, threads) and
+    reuse it for every Transcriber created in this process.
+    
+    Args:
+        device: "cuda" or "cpu"
+        compute_type: CTranslate2 compute type (e.g. "float16", "int8")
+        cpu_threads: Number of CTranslate2 intra-op threads
+        
+    Returns:
+        WhisperModel: The shared model instance
+    """
+    key = (MODEL, device, compute_type, cpu_threads)
+    with MODEL_CACHE_LOCK:
+        if key not in MODEL_CACHE:
+            MODEL_CACHE[key] = WhisperModel(
+                MODEL,
+                device=device,
+                compute_type=compute_type,
+                cpu_threads=cpu_threads,
+                num_workers=1
+            )
+        return MODEL_CACHE[key]
 
 class TranscriptionError(Exception):
     pass
@@ -34,6 +68,14 @@ class Transcription(BaseModel):
     transcription: str = Field(description="The full transcription of the audio file")
     timestamp: str = Field(description="Time of transcription")
 
+class TranscriptionReport(BaseModel):
+    """Counters collected while transcribing one file, filled in even if transcription fails."""
+    cache_hit: bool = Field(default=False, description="Whether the text came from the transcription cache")
+    decoded: bool = Field(default=False, description="Whether every speech segment was decoded")
+    segments: int = Field(default=0, description="Number of speech segments transcribed")
+    retries: int = Field(default=0, description="Number of retried transcription attempts")
+    errors: List[str] = Field(default_factory=list, description="Error messages from failed attempts")
+
 class Transcriber(Logger):
     name = "Transcriber"
     color = Logger.BLUE
@@ -41,12 +83,27 @@ class Transcriber(Logger):
     def __init__(self):
         """
         Initialize the Transcriber with Whisper model and Langfuse observability.
-        Sets up thread-safe transcription with configurable chunk processing.
+        Loads the faster-whisper (CTranslate2) model in float16 on CUDA when a GPU is
+        available, otherwise in int8 on CPU, and wraps it in a batched inference
+        pipeline that decodes batch_size speech segments per forward pass.
+        Batch size and CPU threads are derived from the hardware and can be
+        overridden with TRANSCRIBER_BATCH_SIZE and TRANSCRIBER_CPU_THREADS.
         """
-        self.whisper = whisper.load_model(MODEL)
-        self.max_workers = 4
-        self.chunk_length_ms = 90_000
-        self.lock = threading.Lock()
+        cpu_count = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+        if ctranslate2.get_cuda_device_count() > 0:
+            self.device, self.compute_type = "cuda", "float16"
+            default_batch_size = 16
+        else:
+            self.device, self.compute_type = "cpu", "int8"
+            default_batch_size = max(1, min(8, cpu_count // 2))
+        self.batch_size = int(os.getenv("TRANSCRIBER_BATCH_SIZE", default_batch_size))
+        self.cpu_threads = int(os.getenv("TRANSCRIBER_CPU_THREADS", cpu_count))
+        self.whisper = load_whisper(self.device, self.compute_type, self.cpu_threads)
+        self.pipeline = BatchedInferencePipeline(model=self.whisper)
+        
+        self.db_file = os.path.join(DB_PATH, "transcriptions.jsonl")
+        self.db = JsonlWriter(self.db_file)
+        self.cache = ResponseCache(os.path.join(DB_PATH, "transcription_cache.sqlite"))
         
         self.langfuse = Langfuse(
             secret_key=os.getenv("LANGFUSE_SECRET_KEY"),
@@ -54,43 +111,20 @@ class Transcriber(Logger):
             host=os.getenv("LANGFUSE_HOST")
         )
         
-        self.log(f"Loaded Whisper model '{MODEL}', workers: {self.max_workers}, chunk length: {self.chunk_length_ms}ms")
+        self.log(f"Loaded Whisper model '{MODEL}' on {self.device} ({self.compute_type}), batch size: {self.batch_size}, cpu threads: {self.cpu_threads}")
 
-    def transcribe_chunk(self, chunk_data):
+    def close(self):
         """
-        Transcribe a single audio chunk using Whisper model with thread safety.
-        Uses a lock to prevent concurrent access to the model which can cause crashes.
-        Note: Not decorated with @observe because it runs in parallel threads where
-        Langfuse context is not maintained.
-        
-        Args:
-            chunk_data: Tuple of (chunk_index, chunk_file_path)
-            
-        Returns:
-            tuple: (chunk_index, transcription_text)
+        Drain pending records and close the transcriptions database. Call on shutdown.
         """
-        idx, chunk_file = chunk_data
-        self.log(f"Transcribing chunk {idx + 1}")
-        
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                with self.lock:
-                    result = self.whisper.transcribe(chunk_file, fp16=False)
-                
-                transcription_text = result["text"]
-                return idx, transcription_text
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    self.log(f"Retry {attempt + 1}/{max_retries - 1} for chunk {idx + 1}: {str(e)}")
-                else:
-                    self.log(f"Error in chunk {idx + 1} after {max_retries} attempts: {str(e)}")
-                    raise TranscriptionError(f"Failed to transcribe chunk {idx + 1}: {str(e)}")
+        self.db.close()
 
     @observe(name="save-transcription", as_type="span")
     def save_transcription(self, audio_file, transcription_text, session_id):
         """
         Save the transcription to JSONL database with the provided session ID.
+        The record is serialized with orjson and handed to the group-commit writer,
+        which batches fsyncs.
         
         Args:
             audio_file: Path to the original audio file
@@ -100,155 +134,149 @@ class Transcriber(Logger):
         Returns:
             Transcription: The saved transcription object with metadata
         """
-        db_path = r"D:\Projects\audio_preprocessor\backend\databases"
-        jsonl_file = os.path.join(db_path, "transcriptions.jsonl")
-        os.makedirs(db_path, exist_ok=True)
+        record = {
+            "id": session_id,
+            "name": os.path.basename(audio_file),
+            "transcription": transcription_text,
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime())
+        }
         
-        transcription_obj = Transcription(
-            id=session_id,
-            name=os.path.basename(audio_file),
-            transcription=transcription_text,
-            timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        )
+        self.db.write_serialized(orjson.dumps(record))
+        transcription_obj = Transcription.model_construct(**record)
         
-        with open(jsonl_file, 'a', encoding='utf-8') as f:
-            f.write(transcription_obj.model_dump_json() + '\n')
-            f.flush()
-            os.fsync(f.fileno())
-            
-        self.log(f"Transcription {transcription_obj.id} saved to {jsonl_file}")
+        self.log(f"Transcription {transcription_obj.id} saved to {self.db_file}")
         return transcription_obj
 
-    @observe(name="split-audio-chunks", as_type="span")
-    def split_audio_chunks(self, audio):
+    @staticmethod
+    def audio_digest(audio_file):
         """
-        Split audio into chunks and merge tiny trailing fragments.
-        Prevents tensor errors from sub-second audio fragments.
+        Hash the raw bytes of an audio file with BLAKE2b.
         
         Args:
-            audio: AudioSegment object to be split
+            audio_file: Path to the audio file
             
         Returns:
-            list: List of AudioSegment chunks ready for transcription
+            str: Hex digest of the file contents
         """
-        raw_chunks = [audio[i:i + self.chunk_length_ms] 
-                     for i in range(0, len(audio), self.chunk_length_ms)]
-        
-        chunks = []
-        for chunk in raw_chunks:
-            if len(chunk) < 1000 and len(chunks) > 0:
-                chunks[-1] = chunks[-1] + chunk
-                self.log("Merged a tiny trailing fragment into the previous chunk.")
-            else:
-                chunks.append(chunk)
+        digest = hashlib.blake2b(digest_size=16)
+        with open(audio_file, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+        return digest.hexdigest()
 
-        self.log(f"Audio split into {len(chunks)} valid chunks")
-        
-        langfuse_context.update_current_observation(
-            metadata={
-                "total_chunks": len(chunks),
-                "chunk_length_ms": self.chunk_length_ms,
-                "audio_duration_ms": len(audio)
-            }
-        )
-        
-        return chunks
-
-    @observe(name="process-chunks-parallel", as_type="span")
-    def process_chunks_parallel(self, chunks, tmpdir):
+    @observe(name="batched-transcription", as_type="span")
+    def transcribe_samples(self, samples, report=None):
         """
-        Export audio chunks to temporary files and transcribe them in parallel.
+        Transcribe the whole recording with the batched Whisper pipeline.
+        The pipeline splits the audio into speech segments with VAD and decodes
+        batch_size of them per forward pass, so no chunk threads are needed.
+        
+        Failed attempts are retried with exponential backoff and jitter; on an
+        out-of-memory error the batch size is halved for the next attempt.
         
         Args:
-            chunks: List of AudioSegment chunks
-            tmpdir: Temporary directory path for chunk files
+            samples: 16 kHz mono float32 samples of the full recording
+            report: Optional TranscriptionReport to record segments, retries and errors in
             
         Returns:
-            dict: Dictionary mapping chunk indices to transcription text
+            str: The transcription text
         """
-        transcriptions = {}
-        chunk_files = []
-        
-        for idx, chunk in enumerate(chunks):
-            max_retries = 3
-            for attempt in range(max_retries):
-                try:
-                    chunk_file = os.path.join(tmpdir, f"chunk_{idx}.mp3")
-                    chunk.export(chunk_file, format="mp3")
-                    chunk_files.append((idx, chunk_file))
-                    break
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        self.log(f"Retry {attempt + 1}/{max_retries - 1} exporting chunk {idx}: {str(e)}")
-                    else:
-                        self.log(f"Error exporting chunk {idx} after {max_retries} attempts: {str(e)}")
-                        raise TranscriptionError(f"Failed to export chunk {idx}: {str(e)}")
-
-        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-            futures = {executor.submit(self.transcribe_chunk, chunk_data): chunk_data 
-                      for chunk_data in chunk_files}
-            
-            for future in as_completed(futures):
-                idx, transcription_text = future.result()
-                transcriptions[idx] = transcription_text
-                self.log(f"Completed chunk {idx + 1}/{len(chunks)}")
+        report = report if report is not None else TranscriptionReport()
+        max_retries = 3
+        batch_size = self.batch_size
+        for attempt in range(max_retries):
+            try:
+                segments, _ = self.pipeline.transcribe(samples, batch_size=batch_size, beam_size=1)
+                segment_texts = [segment.text for segment in segments]
+                break
+            except Exception as e:
+                report.errors.append(str(e))
+                if attempt < max_retries - 1:
+                    if "out of memory" in str(e).lower() and batch_size > 1:
+                        batch_size //= 2
+                        self.log(f"Out of memory, retrying with batch size {batch_size}")
+                    delay = 0.1 * (2 ** attempt) + random.uniform(0, 0.1)
+                    report.retries += 1
+                    self.log(f"Retry {attempt + 1}/{max_retries - 1} transcribing audio in {delay:.2f}s: {str(e)}")
+                    time.sleep(delay)
+                else:
+                    self.log(f"Error transcribing audio after {max_retries} attempts: {str(e)}")
+                    raise TranscriptionError(f"Failed to transcribe audio: {str(e)}")
 
+        report.segments = len(segment_texts)
+        report.decoded = True
+        self.log(f"Transcribed {len(segment_texts)} speech segments")
+        
         langfuse_context.update_current_observation(
             metadata={
-                "total_chunks_processed": len(transcriptions),
-                "max_workers": self.max_workers
+                "total_segments": len(segment_texts),
+                "batch_size": batch_size,
+                "audio_duration_ms": len(samples) * 1000 // 16000
             }
         )
         
-        return transcriptions
+        return "".join(segment_texts).strip()
 
-    @observe(name="audio-transcription")
-    def transcribe(self, audio_file):
+    def check_format(self, audio_name):
         """
-        Main transcription workflow that processes audio file into text.
-        Splits long audio into chunks, transcribes in parallel, and combines results.
-        Creates a Langfuse trace with session tracking and scores the result.
+        Reject audio whose extension is not a supported format.
         
         Args:
-            audio_file: Path to the audio file to transcribe
+            audio_name: File name or path of the audio
             
-        Returns:
-            Transcription: The final transcription object saved to database
+        Raises:
+            TranscriptionError: If the extension is not supported
         """
-
         valid_formats = ['.mp3', '.wav', '.m4a', '.flac', '.ogg', '.opus', '.wma', '.aac']
-        file_ext = os.path.splitext(audio_file)[1].lower()
-        
-        if not os.path.exists(audio_file):
-            raise TranscriptionError(f"Audio file not found: {audio_file}")
+        file_ext = os.path.splitext(audio_name)[1].lower()
         
         if file_ext not in valid_formats:
             raise TranscriptionError(f"Invalid file format '{file_ext}'. Supported formats: {', '.join(valid_formats)}")
+
+    def run_transcription(self, audio_name, digest, audio_source, report=None):
+        """
+        Shared workflow behind transcribe and transcribe_bytes: answers from the
+        cache or decodes and transcribes the audio, then saves and scores the result.
         
+        Args:
+            audio_name: File name stored with the transcription
+            digest: BLAKE2b hex digest of the audio bytes
+            audio_source: Path or binary file object accepted by decode_audio
+            report: Optional TranscriptionReport to fill in
+            
+        Returns:
+            Transcription: The final transcription object saved to database
+        """
         session_id = str(uuid.uuid4())
         
         langfuse_context.update_current_trace(
             session_id=session_id,
             tags=["transcription", "audio", "whisper"],
             metadata={
-                "audio_file": os.path.basename(audio_file),
+                "audio_file": os.path.basename(audio_name),
                 "model": MODEL,
-                "chunk_length_ms": self.chunk_length_ms,
-                "max_workers": self.max_workers
+                "device": self.device,
+                "compute_type": self.compute_type,
+                "batch_size": self.batch_size
             }
         )
 
-        self.log(f"Loading audio file: {audio_file}")
-        audio = AudioSegment.from_file(audio_file)
-
-        chunks = self.split_audio_chunks(audio)
-
-        with TemporaryDirectory() as tmpdir:
-            transcriptions = self.process_chunks_parallel(chunks, tmpdir)
-
-        final_text = " ".join([transcriptions.get(i, "") for i in range(len(chunks))])
+        cache_key = f"{MODEL}:{digest}"
+        final_text = self.cache.get(cache_key)
+        
+        if final_text is not None:
+            self.log(f"Cache hit for {os.path.basename(audio_name)}, skipping Whisper")
+            langfuse_context.update_current_trace(metadata={"cache_hit": True})
+            if report is not None:
+                report.cache_hit = True
+                report.decoded = True
+        else:
+            self.log(f"Loading audio file: {audio_name}")
+            samples = decode_audio(audio_source, sampling_rate=16000)
+            final_text = self.transcribe_samples(samples, report)
+            self.cache.set(cache_key, final_text)
         
-        result = self.save_transcription(audio_file, final_text, session_id)
+        result = self.save_transcription(audio_name, final_text, session_id)
         
         self.langfuse.score(
             trace_id=langfuse_context.get_current_trace_id(),
@@ -259,6 +287,47 @@ class Transcriber(Logger):
         
         return result
 
+    @observe(name="audio-transcription")
+    def transcribe(self, audio_file, report=None):
+        """
+        Main transcription workflow that processes audio file into text.
+        Decodes the audio once and transcribes it with batched Whisper inference.
+        Files already transcribed with the same model are answered from the cache.
+        Creates a Langfuse trace with session tracking and scores the result.
+        
+        Args:
+            audio_file: Path to the audio file to transcribe
+            report: Optional TranscriptionReport that is filled in as the file is processed,
+                so callers can inspect retries and errors even when this raises
+            
+        Returns:
+            Transcription: The final transcription object saved to database
+        """
+        if not os.path.exists(audio_file):
+            raise TranscriptionError(f"Audio file not found: {audio_file}")
+        
+        self.check_format(audio_file)
+        return self.run_transcription(audio_file, self.audio_digest(audio_file), audio_file, report)
+
+    @observe(name="audio-transcription")
+    def transcribe_bytes(self, audio_name, data, report=None):
+        """
+        Transcribe audio held in memory, such as an uploaded file, without
+        writing it to disk first. PyAV decodes straight from the bytes.
+        
+        Args:
+            audio_name: Original file name; its extension selects the format check
+                and it is stored as the transcription's name
+            data: Raw bytes of the encoded audio file
+            report: Optional TranscriptionReport to fill in
+            
+        Returns:
+            Transcription: The final transcription object saved to database
+        """
+        self.check_format(audio_name)
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return self.run_transcription(audio_name, digest, io.BytesIO(data), report)
+
 if __name__ == "__main__":
     transcriber = Transcriber()
     
@@ -275,4 +344,6 @@ if __name__ == "__main__":
         print("\nLangfuse traces flushed.")
     except Exception as e:
         print(f"CRITICAL ERROR: {e}")
+    finally:
+        transcriber.close()
         
\ No newline at end of file
@@ -1,24 +1,40 @@
-from openai import OpenAI 
-from pydantic import BaseModel, Field
+from openai import AsyncOpenAI, RateLimitError, APIConnectionError, APITimeoutError, InternalServerError
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 from dotenv import load_dotenv
 from datetime import datetime
 from color import Logger
 import os 
+import sys
 import logging 
 import json
-from typing import List, Dict
+import hashlib
+import asyncio
+import random
+from pathlib import Path
+from typing import List, Dict, Literal
 from collections import Counter
+from itertools import zip_longest
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+from core.cache import ResponseCache
+from core.jsonl_writer import JsonlWriter
 
 load_dotenv(override=True)
 api_key = os.getenv("OPENROUTER_API_KEY")
 base_url = os.getenv("OPENROUTER_URL")
 gpt = os.getenv("GPT_MODEL")
 
+EVALUATION_DIR = Path(__file__).resolve().parent
+TEST_DATA_DIR = EVALUATION_DIR.parent / "test_data" / "preprocessor"
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(message)s'
 )
 
+Level = Literal["HIGH", "MODERATE", "LOW"]
+Quality = Literal["GOLDEN", "ACCEPTABLE", "POOR"]
+
 
 class EvaluationError(BaseModel):
     """Custom exception model for evaluation errors"""
@@ -32,81 +48,53 @@ class Result(BaseModel):
     """Complete evaluation result with metadata"""
     id: str = Field(description="Unique identifier for the evaluation result")
     file_name: str = Field(description="Name of the file being evaluated")
-    meaning_preservation: str = Field(description="Score for meaning preservation: HIGH | MODERATE | LOW")
-    information_loss: str = Field(description="The amount of information lost during preprocessing: HIGH | MODERATE | LOW")
-    preprocessing_quality: str = Field(description="How well the preprocessing was done: GOLDEN | ACCEPTABLE | POOR")
-    hallucination: str = Field(description="How much AI hallucinated while preprocessing: HIGH | MODERATE | LOW")
-    confidence: float = Field(description="Confidence level of AI in the Output")
+    meaning_preservation: Level = Field(description="Score for meaning preservation: HIGH | MODERATE | LOW")
+    information_loss: Level = Field(description="The amount of information lost during preprocessing: HIGH | MODERATE | LOW")
+    preprocessing_quality: Quality = Field(description="How well the preprocessing was done: GOLDEN | ACCEPTABLE | POOR")
+    hallucination: Level = Field(description="How much AI hallucinated while preprocessing: HIGH | MODERATE | LOW")
+    confidence: float = Field(ge=0.0, le=1.0, description="Confidence level of AI in the Output")
     reasoning: str = Field(description="Detailed reasoning behind the values given")
+    judge_model: str = Field(default="", description="Model that produced the verdict")
     timestamp: str = Field(default_factory=lambda: datetime.now().isoformat())
 
 
+# Built once so every execution record reuses the same compiled serializer/validator
+RESULT_ADAPTER = TypeAdapter(Result)
+
+
 class AIResult(BaseModel):
     """AI evaluation result without metadata"""
-    meaning_preservation: str = Field(description="Score for meaning preservation: HIGH | MODERATE | LOW")
-    information_loss: str = Field(description="The amount of information lost during preprocessing: HIGH | MODERATE | LOW")
-    preprocessing_quality: str = Field(description="How well the preprocessing was done: GOLDEN | ACCEPTABLE | POOR")
-    hallucination: str = Field(description="How much AI hallucinated while preprocessing: HIGH | MODERATE | LOW")
-    confidence: float = Field(description="Confidence level of AI in the Output")
+    meaning_preservation: Level = Field(description="Score for meaning preservation: HIGH | MODERATE | LOW")
+    information_loss: Level = Field(description="The amount of information lost during preprocessing: HIGH | MODERATE | LOW")
+    preprocessing_quality: Quality = Field(description="How well the preprocessing was done: GOLDEN | ACCEPTABLE | POOR")
+    hallucination: Level = Field(description="How much AI hallucinated while preprocessing: HIGH | MODERATE | LOW")
+    confidence: float = Field(ge=0.0, le=1.0, description="Confidence level of AI in the Output")
     reasoning: str = Field(description="Detailed reasoning behind the values given")
 
 
-SYSTEM_PROMPT = """ 
-PERSONA:
-You are an expert AI judge specializing in evaluating the quality of AI-generated text preprocessing.
-
-TASK:
-Your task is to assess the preprocessing based on specific criteria and provide a detailed evaluation on the following metrics:
-1. meaning_preservation (HIGH | MODERATE | LOW)
-2. information_loss (HIGH | MODERATE | LOW)
-3. preprocessing_quality (GOLDEN | ACCEPTABLE | POOR)
-4. hallucination (HIGH | MODERATE | LOW)
-5. confidence (0.0 to 1.0)
-6. reasoning (text explaining your judgments)
-
-CONSTRAINTS:
-1. Use only the VALID values for each metric as mentioned above.
-2. Reason **before assigning any score**.
-3. Provide detailed reasoning for each score in the "reasoning" field.
-4. You must output a valid JSON object only, without any extra text or commentary.
-
-OUTPUT FORMAT:
-{
-  "meaning_preservation": "...",
-  "information_loss": "...",
-  "preprocessing_quality": "...",
-  "hallucination": "...",
-  "confidence": ...,
-  "reasoning": "..."
-}
-
-REASONING STEPS:
-Step 1: Analyze the original and preprocessed transcriptions thoroughly. Evaluate how much of the meaning is preserved. Then mark meaning_preservation as HIGH (very well preserved), MODERATE (some meaning lost), or LOW (significant meaning lost).
-
-Step 2: Evaluate information_loss by comparing the original transcription with the preprocessed data. Mark it as HIGH (a lot of information lost), MODERATE (some information lost), or LOW (minimal information lost).
-
-Step 3: Assess the overall quality of preprocessing based on clarity, coherence, and relevance. Mark preprocessing_quality as GOLDEN (excellent), ACCEPTABLE (good), or POOR (subpar).
-
-Step 4: Evaluate hallucination by checking for any fabricated or incorrect information in the preprocessed data. Mark hallucination as HIGH (frequent hallucinations), MODERATE (some hallucinations), or LOW (rare or none).
+class BatchAIResult(BaseModel):
+    """AI evaluation results for several pairs judged in one request"""
+    items: List[AIResult] = Field(description="One evaluation per numbered pair, in order")
 
-Step 5: Provide a confidence score between 0.0 and 1.0 indicating your confidence in the above evaluations.
 
-Step 6: Combine all your reasoning into the "reasoning" field, justifying each metric assignment.
-
-EXAMPLE:
-
-Original transcription: "I didn't go to the store yesterday, but I went today."
-Preprocessed transcription: "I went to the store today."
+SYSTEM_PROMPT = """ 
+You are an expert judge of AI text preprocessing. Compare the original transcription with the preprocessed one and score:
+- meaning_preservation: HIGH | MODERATE | LOW (how much of the original meaning survives)
+- information_loss: HIGH | MODERATE | LOW (how much information was dropped)
+- preprocessing_quality: GOLDEN | ACCEPTABLE | POOR (clarity, coherence and relevance of the result)
+- hallucination: HIGH | MODERATE | LOW (fabricated or incorrect content)
+- confidence: 0.0 to 1.0
+- reasoning: a brief justification of each score
+
+Respond with the JSON object only.
+"""
 
-{
-  "meaning_preservation": "MODERATE",
-  "information_loss": "MODERATE",
-  "preprocessing_quality": "ACCEPTABLE",
-  "hallucination": "LOW",
-  "confidence": 0.95,
-  "reasoning": "The preprocessed text removed the temporal clause 'didn't go yesterday'. This reduces meaning preservation to MODERATE, with moderate information loss. Preprocessing quality is ACCEPTABLE as main content is preserved. No hallucinations are present. Overall confidence is high."
+METRIC_WEIGHTS = {
+    "meaning_preservation": {"HIGH": 3, "MODERATE": 2, "LOW": 1},
+    "information_loss": {"LOW": 3, "MODERATE": 2, "HIGH": 1},
+    "preprocessing_quality": {"GOLDEN": 3, "ACCEPTABLE": 2, "POOR": 1},
+    "hallucination": {"LOW": 3, "MODERATE": 2, "HIGH": 1}
 }
-"""
 
 USER_PROMPT = """ 
 Here is the original transcription:
@@ -118,6 +106,17 @@ And, here is the preprocessed transcription:
 Now, please evaluate them
 """
 
+USER_PROMPT_GROUPED = """ 
+Evaluate each of the following {count} pairs independently.
+Return exactly one evaluation per pair in "items", in the same order as the pairs.
+
+{pairs}
+"""
+
+PAIR_BLOCK = "<PAIR {number}>\nORIGINAL:\n{transcription}\n\nPREPROCESSED:\n{preprocessed_transcription}\n</PAIR {number}>"
+
+CHARS_PER_TOKEN = 4
+
 
 class AIJudge(Logger):
     """
@@ -131,14 +130,23 @@ class AIJudge(Logger):
         """Initialize the AI Judge with OpenAI client and file paths"""
         try:
             self.log("Initializing AI Judge...")
-            self.client = OpenAI(api_key=api_key, base_url=base_url)
+            self.client = AsyncOpenAI(api_key=api_key, base_url=base_url)
+            self.max_concurrency = 16
+            self.pairs_per_request = 4
+            self.max_group_tokens = 8000
+            self.max_attempts = 5
+            self.retry_base_delay = 1.0
+            self.retry_max_delay = 30.0
             self.system_prompt = SYSTEM_PROMPT
+            self.system_message = {"role": "system", "content": self.system_prompt}
             self.user_prompt = USER_PROMPT
             self.model = gpt
-            self.transcriptions_path = r"D:\Projects\audio_preprocessor\backend\evaluations\test_data\preprocessor\transcriptions_data.jsonl"
-            self.preprocessed_transcriptions_path = r"D:\Projects\audio_preprocessor\backend\evaluations\test_data\preprocessor\preprocessings.jsonl"
-            self.summary_path = r"D:\Projects\audio_preprocessor\backend\evaluations\preprocessor\judge_evaluation_summary.md"
-            self.execution_path = r"D:\Projects\audio_preprocessor\backend\evaluations\preprocessor\judge_executions.jsonl"
+            self.transcriptions_path = Path(os.getenv("JUDGE_TRANSCRIPTIONS_PATH", TEST_DATA_DIR / "transcriptions_data.jsonl"))
+            self.preprocessed_transcriptions_path = Path(os.getenv("JUDGE_PREPROCESSED_PATH", TEST_DATA_DIR / "preprocessings.jsonl"))
+            self.summary_path = Path(os.getenv("JUDGE_SUMMARY_PATH", EVALUATION_DIR / "judge_evaluation_summary.md"))
+            self.execution_path = Path(os.getenv("JUDGE_EXECUTIONS_PATH", EVALUATION_DIR / "judge_executions.jsonl"))
+            self.executions = None
+            self.cache = ResponseCache(Path(os.getenv("JUDGE_CACHE_PATH", EVALUATION_DIR / "judge_cache.sqlite")))
             self.log(f"AI Judge initialized successfully with model: {self.model}")
         except Exception as e:
             error = EvaluationError(
@@ -150,51 +158,33 @@ class AIJudge(Logger):
             self.log(f"Error initializing AI Judge: {error.message}")
             raise Exception(error.model_dump_json())
     
-    def load(self):
-        """Load transcriptions and preprocessed transcriptions from JSONL files with validation"""
+    def iter_pairs(self):
+        """Stream validated (transcription, preprocessed) pairs from both JSONL files in lockstep"""
         try:
-            self.log("Loading transcription data...")
-            transcriptions = []
-            preprocessed_transcriptions = []
-
-            with open(self.transcriptions_path, "r", encoding="utf-8") as f:
-                for idx, line in enumerate(f):
-                    transcription_obj = json.loads(line.strip())
-                    transcriptions.append(transcription_obj)
-                self.log(f"Loaded {len(transcriptions)} original transcriptions")
-
-            with open(self.preprocessed_transcriptions_path, "r", encoding="utf-8") as f:
-                for idx, line in enumerate(f):
-                    preprocessed_obj = json.loads(line.strip())
-                    preprocessed_transcriptions.append(preprocessed_obj)
-                self.log(f"Loaded {len(preprocessed_transcriptions)} preprocessed transcriptions")
-
-            self.log("Validating ID and name consistency...")
-            mismatches = []
-            for trans, prep in zip(transcriptions, preprocessed_transcriptions):
-                trans_id = trans.get("id")
-                prep_id = prep.get("id")
-                trans_name = trans.get("name")
-                prep_name = prep.get("name")
-                
-                if trans_id != prep_id or trans_name != prep_name:
-                    mismatches.append({
-                        "transcription": {"id": trans_id, "name": trans_name},
-                        "preprocessed": {"id": prep_id, "name": prep_name}
-                    })
-            
-            if mismatches:
-                error = EvaluationError(
-                    error_type="ValidationError",
-                    message=f"Found {len(mismatches)} mismatches between transcription and preprocessed objects",
-                    timestamp=datetime.now().isoformat(),
-                    context={"mismatches": mismatches}
-                )
-                self.log(f"Validation failed: {error.message}")
-                raise Exception(error.model_dump_json())
-            
-            self.log("Validation successful: All IDs and names match")
-            return transcriptions, preprocessed_transcriptions
+            self.log("Streaming transcription data...")
+            with open(self.transcriptions_path, "rb") as trans_file, \
+                 open(self.preprocessed_transcriptions_path, "rb") as prep_file:
+                for idx, (trans_line, prep_line) in enumerate(zip_longest(trans_file, prep_file), 1):
+                    if trans_line is None or prep_line is None:
+                        raise ValueError(f"Mismatch in data lengths: files diverge at line {idx}")
+                    
+                    trans = json.loads(trans_line)
+                    prep = json.loads(prep_line)
+                    
+                    if trans.get("id") != prep.get("id") or trans.get("name") != prep.get("name"):
+                        error = EvaluationError(
+                            error_type="ValidationError",
+                            message=f"Mismatch between transcription and preprocessed objects at line {idx}",
+                            timestamp=datetime.now().isoformat(),
+                            context={"mismatches": [{
+                                "transcription": {"id": trans.get("id"), "name": trans.get("name")},
+                                "preprocessed": {"id": prep.get("id"), "name": prep.get("name")}
+                            }]}
+                        )
+                        self.log(f"Validation failed: {error.message}")
+                        raise Exception(error.model_dump_json())
+                    
+                    yield trans, prep
             
         except json.JSONDecodeError as e:
             error = EvaluationError(
@@ -202,8 +192,8 @@ class AIJudge(Logger):
                 message=f"Invalid JSON format: {str(e)}",
                 timestamp=datetime.now().isoformat(),
                 context={
-                    "transcriptions_path": self.transcriptions_path,
-                    "preprocessed_path": self.preprocessed_transcriptions_path
+                    "transcriptions_path": str(self.transcriptions_path),
+                    "preprocessed_path": str(self.preprocessed_transcriptions_path)
                 }
             )
             self.log(f"Error parsing JSON: {error.message}")
@@ -216,8 +206,8 @@ class AIJudge(Logger):
                 message=str(e),
                 timestamp=datetime.now().isoformat(),
                 context={
-                    "transcriptions_path": self.transcriptions_path,
-                    "preprocessed_path": self.preprocessed_transcriptions_path
+                    "transcriptions_path": str(self.transcriptions_path),
+                    "preprocessed_path": str(self.preprocessed_transcriptions_path)
                 }
             )
             self.log(f"Error loading data: {error.message}")
@@ -225,26 +215,80 @@ class AIJudge(Logger):
 
     def make_messages(self, transcription: str, preprocessed_transcription: str) -> List[Dict]:
         """Create message array for API call with system and user prompts"""
-        system_message = {"role": "system", "content": self.system_prompt}
         user_content = self.user_prompt.format(
             transcription=transcription,
             preprocessed_transcription=preprocessed_transcription
         )
         user_message = {"role": "user", "content": user_content}
-        return [system_message, user_message]
+        return [self.system_message, user_message]
+    
+    def make_group_messages(self, pairs: List[tuple]) -> List[Dict]:
+        """Create message array asking for one evaluation per numbered (transcription, preprocessed) pair"""
+        blocks = "\n\n".join(
+            PAIR_BLOCK.format(number=number, transcription=transcription, preprocessed_transcription=preprocessed_transcription)
+            for number, (transcription, preprocessed_transcription) in enumerate(pairs, 1)
+        )
+        user_message = {"role": "user", "content": USER_PROMPT_GROUPED.format(count=len(pairs), pairs=blocks)}
+        return [self.system_message, user_message]
+    
+    @staticmethod
+    def estimate_tokens(trans_obj: Dict, prep_obj: Dict) -> int:
+        """Rough prompt size of a pair, at about 4 characters per token"""
+        text_length = len(trans_obj.get("transcription") or "") + len(prep_obj.get("preprocessed_transcription") or "")
+        return text_length // CHARS_PER_TOKEN
     
-    def save_execution(self, result: Result, mode: str = "a"):
-        """Save individual evaluation result to execution log file"""
+    @staticmethod
+    def pair_digest(trans_obj: Dict, prep_obj: Dict) -> str:
+        """Hash the content of a pair so identical pairs within a run share one judge call"""
+        content = f"{trans_obj.get('transcription')}\x00{prep_obj.get('preprocessed_transcription')}"
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
+    
+    def load_executions(self) -> Dict[str, Result]:
+        """
+        Load results the current judge model already recorded in the execution log so an interrupted
+        run can resume; switching GPT_MODEL re-judges every pair. A torn last line left by an
+        interrupted write is truncated away and lines that fail validation are skipped, so both are judged again.
+        """
+        completed = {}
+        if not self.execution_path.exists():
+            return completed
+        
+        other_models = 0
+        with open(self.execution_path, "rb+") as f:
+            offset = 0
+            for line in f:
+                if not line.endswith(b"\n"):
+                    self.log(f"Truncating torn last line of {self.execution_path} at byte {offset}")
+                    f.truncate(offset)
+                    break
+                offset += len(line)
+                if not line.strip():
+                    continue
+                try:
+                    result = RESULT_ADAPTER.validate_json(line)
+                except ValidationError as e:
+                    self.log(f"Skipping invalid execution record at byte {offset - len(line)}: {str(e)}")
+                    continue
+                if result.judge_model != self.model:
+                    other_models += 1
+                    continue
+                completed[result.id] = result
+        
+        if other_models:
+            self.log(f"Ignoring {other_models} execution records judged by another model")
+        return completed
+    
+    def save_execution(self, result: Result):
+        """Queue individual evaluation result on the execution log writer"""
         try:
-            with open(self.execution_path, mode, encoding="utf-8") as f:
-                f.write(result.model_dump_json() + "\n")
+            self.executions.write_serialized(RESULT_ADAPTER.dump_json(result))
             self.log(f"Saved execution result for: {result.id}")
         except Exception as e:
             error = EvaluationError(
                 error_type="ExecutionSaveError",
                 message=str(e),
                 timestamp=datetime.now().isoformat(),
-                context={"result_id": result.id, "file_path": self.execution_path}
+                context={"result_id": result.id, "file_path": str(self.execution_path)}
             )
             self.log(f"Error saving execution: {error.message}")
             raise Exception(error.model_dump_json())
@@ -255,30 +299,37 @@ class AIJudge(Logger):
             self.log("Generating evaluation summary...")
             
             total = len(results)
-            successful = sum(1 for r in results if r.preprocessing_quality != "POOR")
+            successful = 0
+            confidence_sum = 0.0
+            meaning_counts = Counter()
+            info_loss_counts = Counter()
+            quality_counts = Counter()
+            hallucination_counts = Counter()
+            meaning_sum = info_loss_sum = quality_sum = hallucination_sum = 0
+            
+            for r in results:
+                successful += r.preprocessing_quality != "POOR"
+                confidence_sum += r.confidence
+                meaning_counts[r.meaning_preservation] += 1
+                info_loss_counts[r.information_loss] += 1
+                quality_counts[r.preprocessing_quality] += 1
+                hallucination_counts[r.hallucination] += 1
+                meaning_sum += METRIC_WEIGHTS["meaning_preservation"][r.meaning_preservation]
+                info_loss_sum += METRIC_WEIGHTS["information_loss"][r.information_loss]
+                quality_sum += METRIC_WEIGHTS["preprocessing_quality"][r.preprocessing_quality]
+                hallucination_sum += METRIC_WEIGHTS["hallucination"][r.hallucination]
+            
             failed = total - successful
             
             success_rate = (successful / total * 100) if total > 0 else 0
             failure_rate = (failed / total * 100) if total > 0 else 0
             
-            meaning_counts = Counter(r.meaning_preservation for r in results)
-            info_loss_counts = Counter(r.information_loss for r in results)
-            quality_counts = Counter(r.preprocessing_quality for r in results)
-            hallucination_counts = Counter(r.hallucination for r in results)
-            
-            avg_confidence = sum(r.confidence for r in results) / total if total > 0 else 0
-            
-            metric_weights = {
-                "meaning_preservation": {"HIGH": 3, "MODERATE": 2, "LOW": 1},
-                "information_loss": {"LOW": 3, "MODERATE": 2, "HIGH": 1},
-                "preprocessing_quality": {"GOLDEN": 3, "ACCEPTABLE": 2, "POOR": 1},
-                "hallucination": {"LOW": 3, "MODERATE": 2, "HIGH": 1}
-            }
+            avg_confidence = confidence_sum / total if total > 0 else 0
             
-            meaning_score = sum(metric_weights["meaning_preservation"][r.meaning_preservation] for r in results) / (total * 3) if total > 0 else 0
-            info_loss_score = sum(metric_weights["information_loss"][r.information_loss] for r in results) / (total * 3) if total > 0 else 0
-            quality_score = sum(metric_weights["preprocessing_quality"][r.preprocessing_quality] for r in results) / (total * 3) if total > 0 else 0
-            hallucination_score = sum(metric_weights["hallucination"][r.hallucination] for r in results) / (total * 3) if total > 0 else 0
+            meaning_score = meaning_sum / (total * 3) if total > 0 else 0
+            info_loss_score = info_loss_sum / (total * 3) if total > 0 else 0
+            quality_score = quality_sum / (total * 3) if total > 0 else 0
+            hallucination_score = hallucination_sum / (total * 3) if total > 0 else 0
             
             markdown = f"""# AI Judge Evaluation Summary
 
@@ -343,11 +394,12 @@ class AIJudge(Logger):
 | ID | File | Meaning | Info Loss | Quality | Hallucination | Confidence |
 |----|------|---------|-----------|---------|---------------|------------|
 """
-            for r in results:
-                markdown += f"| {r.id} | {r.file_name} | {r.meaning_preservation} | {r.information_loss} | {r.preprocessing_quality} | {r.hallucination} | {r.confidence:.2f} |\n"
-            
             with open(self.summary_path, "w", encoding="utf-8") as f:
                 f.write(markdown)
+                f.writelines(
+                    f"| {r.id} | {r.file_name} | {r.meaning_preservation} | {r.information_loss} | {r.preprocessing_quality} | {r.hallucination} | {r.confidence:.2f} |\n"
+                    for r in results
+                )
             
             self.log(f"Summary saved to: {self.summary_path}")
             self.log(f"Success Rate: {success_rate:.2f}% | Overall Score: {(meaning_score + info_loss_score + quality_score + hallucination_score) / 4:.2f}/1.0")
@@ -357,70 +409,195 @@ class AIJudge(Logger):
                 error_type="SummaryGenerationError",
                 message=str(e),
                 timestamp=datetime.now().isoformat(),
-                context={"total_results": len(results), "summary_path": self.summary_path}
+                context={"total_results": len(results), "summary_path": str(self.summary_path)}
             )
             self.log(f"Error generating summary: {error.message}")
             raise Exception(error.model_dump_json())
     
-    def evaluate(self):
-        """Execute evaluation process for all transcription pairs"""
+    async def call_api(self, messages: List[Dict], response_format=AIResult):
+        """Call the judge model, retrying transient 429/5xx/connection errors with full-jitter exponential backoff"""
+        for attempt in range(self.max_attempts):
+            try:
+                response = await self.client.chat.completions.parse(
+                    model=self.model,
+                    messages=messages,
+                    temperature=0.2,
+                    top_p=0.93,
+                    response_format=response_format
+                )
+                return response.choices[0].message.parsed
+            except (RateLimitError, APIConnectionError, APITimeoutError, InternalServerError) as e:
+                if attempt == self.max_attempts - 1:
+                    raise
+                delay = random.uniform(self.retry_base_delay, min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempt + 1)))
+                self.log(f"Attempt {attempt + 1}/{self.max_attempts} failed: {str(e)}. Retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+    
+    def record_result(self, idx: int, trans_obj: Dict, ai_result: AIResult) -> Result:
+        """Attach pair metadata to a verdict and append it to the execution log"""
+        result = Result(
+            id=trans_obj.get("id"),
+            file_name=trans_obj.get("name"),
+            meaning_preservation=ai_result.meaning_preservation,
+            information_loss=ai_result.information_loss,
+            preprocessing_quality=ai_result.preprocessing_quality,
+            hallucination=ai_result.hallucination,
+            confidence=ai_result.confidence,
+            reasoning=ai_result.reasoning,
+            judge_model=self.model
+        )
+        
+        self.save_execution(result)
+        
+        self.log(f"Evaluation {idx} completed - ID: {result.id}, Quality: {result.preprocessing_quality}, Confidence: {result.confidence:.2f}")
+        return result
+    
+    def log_pair_error(self, idx: int, trans_obj: Dict, e: Exception):
+        """Log a failed pair evaluation"""
+        error = EvaluationError(
+            error_type="EvaluationError",
+            message=str(e),
+            timestamp=datetime.now().isoformat(),
+            context={"pair_index": idx, "id": trans_obj.get("id", "unknown")}
+        )
+        self.log(f"Error evaluating pair {idx} (ID: {trans_obj.get('id', 'unknown')}): {error.message}")
+    
+    async def judge_one(self, semaphore: asyncio.Semaphore, idx: int, trans_obj: Dict, messages: List[Dict], cache_key: str):
+        """Evaluate a single transcription pair that missed the cache; returns None if the evaluation fails"""
+        try:
+            async with semaphore:
+                self.log(f"Evaluating pair {idx} - ID: {trans_obj.get('id')}, File: {trans_obj.get('name')}")
+                ai_result = await self.call_api(messages)
+            await asyncio.to_thread(self.cache.set, cache_key, ai_result.model_dump_json())
+            return self.record_result(idx, trans_obj, ai_result)
+        except Exception as e:
+            self.log_pair_error(idx, trans_obj, e)
+            return None
+    
+    async def judge_group(self, semaphore: asyncio.Semaphore, group: List[tuple]):
+        """
+        Resolve the verdict future of every (idx, trans_obj, prep_obj, future) entry in the group.
+        Cached pairs are answered from the cache; the rest share one grouped request, falling back
+        to per-pair requests if that request fails or the model returns no or the wrong number of evaluations.
+        """
+        misses = []
+        try:
+            for idx, trans_obj, prep_obj, future in group:
+                messages = self.make_messages(trans_obj.get("transcription"), prep_obj.get("preprocessed_transcription"))
+                cache_key = self.cache.make_key(self.model, messages)
+                # SQLite calls block, so they run off the event loop
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                
+                if cached is None:
+                    misses.append((idx, trans_obj, prep_obj, future, messages, cache_key))
+                    continue
+                
+                self.log(f"Cache hit for pair {idx} - ID: {trans_obj.get('id')}")
+                future.set_result(self.record_result(idx, trans_obj, AIResult.model_validate_json(cached)))
+            
+            if len(misses) > 1:
+                messages = self.make_group_messages([
+                    (trans_obj.get("transcription"), prep_obj.get("preprocessed_transcription"))
+                    for _, trans_obj, prep_obj, _, _, _ in misses
+                ])
+                try:
+                    async with semaphore:
+                        self.log(f"Evaluating pairs {', '.join(str(miss[0]) for miss in misses)} in one request")
+                        batch = await self.call_api(messages, response_format=BatchAIResult)
+                except Exception as e:
+                    self.log(f"Grouped request failed: {str(e)}, falling back to per-pair requests")
+                else:
+                    if batch is None:
+                        self.log("Grouped request returned no parsed evaluations, falling back to per-pair requests")
+                    elif len(batch.items) == len(misses):
+                        await asyncio.to_thread(self.cache.set_many, [
+                            (cache_key, ai_result.model_dump_json())
+                            for (_, _, _, _, _, cache_key), ai_result in zip(misses, batch.items)
+                        ])
+                        for (idx, trans_obj, _, future, _, _), ai_result in zip(misses, batch.items):
+                            future.set_result(self.record_result(idx, trans_obj, ai_result))
+                        return
+                    else:
+                        self.log(f"Grouped request returned {len(batch.items)} evaluations for {len(misses)} pairs, falling back to per-pair requests")
+            
+            results = await asyncio.gather(*(
+                self.judge_one(semaphore, idx, trans_obj, messages, cache_key)
+                for idx, trans_obj, _, _, messages, cache_key in misses
+            ))
+            for (_, _, _, future, _, _), result in zip(misses, results):
+                future.set_result(result)
+        
+        except Exception as e:
+            for idx, trans_obj, _, future in group:
+                if not future.done():
+                    self.log_pair_error(idx, trans_obj, e)
+                    future.set_result(None)
+    
+    async def evaluate(self):
+        """
+        Execute evaluation process for all transcription pairs concurrently, skipping IDs already in the
+        execution log. Unique pairs are judged in groups of up to pairs_per_request per API call;
+        pairs with identical content reuse the first pair's verdict.
+        """
         try:
             self.log("Starting evaluation process...")
-            transcriptions, preprocessed_transcriptions = self.load()
+            completed = self.load_executions()
+            if completed:
+                self.log(f"Resuming: {len(completed)} pairs already evaluated")
             
-            if len(transcriptions) != len(preprocessed_transcriptions):
-                raise ValueError(f"Mismatch in data lengths: {len(transcriptions)} vs {len(preprocessed_transcriptions)}")
+            self.executions = JsonlWriter(self.execution_path)
             
-            results = []
-            total_pairs = len(transcriptions)
+            async def evaluate_pair(idx, trans_obj, verdict):
+                result = await verdict
+                if result is None or result.id == trans_obj.get("id"):
+                    return result
+                self.log(f"Pair {idx} - ID: {trans_obj.get('id')} duplicates {result.id}, reusing its verdict")
+                duplicate = result.model_copy(update={"id": trans_obj.get("id"), "file_name": trans_obj.get("name")})
+                self.save_execution(duplicate)
+                return duplicate
             
-            for idx, (trans_obj, prep_obj) in enumerate(zip(transcriptions, preprocessed_transcriptions), 1):
-                try:
-                    trans_id = trans_obj.get("id")
-                    trans_name = trans_obj.get("name")
-                    transcription = trans_obj.get("transcription")
-                    preprocessed_transcription = prep_obj.get("preprocessed_transcription")
-                    
-                    self.log(f"Evaluating pair {idx}/{total_pairs} - ID: {trans_id}, File: {trans_name}")
+            loop = asyncio.get_running_loop()
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            verdicts = {}
+            resumed = []
+            tasks = []
+            group_tasks = []
+            group = []
+            group_tokens = 0
+            try:
+                for idx, (trans_obj, prep_obj) in enumerate(self.iter_pairs(), 1):
+                    if trans_obj.get("id") in completed:
+                        resumed.append(completed[trans_obj.get("id")])
+                        continue
                     
-                    messages = self.make_messages(transcription, preprocessed_transcription)
+                    digest = self.pair_digest(trans_obj, prep_obj)
+                    if digest not in verdicts:
+                        pair_tokens = self.estimate_tokens(trans_obj, prep_obj)
+                        if group and (len(group) >= self.pairs_per_request or group_tokens + pair_tokens > self.max_group_tokens):
+                            group_tasks.append(asyncio.create_task(self.judge_group(semaphore, group)))
+                            group, group_tokens = [], 0
+                            await asyncio.sleep(0)
+                        
+                        verdicts[digest] = loop.create_future()
+                        group.append((idx, trans_obj, prep_obj, verdicts[digest]))
+                        group_tokens += pair_tokens
                     
-                    response = self.client.chat.completions.parse(
-                        model=self.model,
-                        messages=messages,
-                        temperature=0.2,
-                        top_p=0.93,
-                        response_format=AIResult
-                    )
-                    
-                    ai_result = response.choices[0].message.parsed
-                    
-                    result = Result(
-                        id=trans_id,
-                        file_name=trans_name,
-                        meaning_preservation=ai_result.meaning_preservation,
-                        information_loss=ai_result.information_loss,
-                        preprocessing_quality=ai_result.preprocessing_quality,
-                        hallucination=ai_result.hallucination,
-                        confidence=ai_result.confidence,
-                        reasoning=ai_result.reasoning
-                    )
-                    
-                    write_mode = "w" if idx == 1 else "a"
-                    self.save_execution(result, mode=write_mode)
+                    tasks.append(asyncio.create_task(evaluate_pair(idx, trans_obj, verdicts[digest])))
+                
+                if group:
+                    group_tasks.append(asyncio.create_task(self.judge_group(semaphore, group)))
+            except Exception:
+                for task in tasks + group_tasks:
+                    task.cancel()
+                raise
+            
+            total_pairs = len(resumed) + len(tasks)
+            results = resumed
+            for done, finished in enumerate(asyncio.as_completed(tasks), len(resumed) + 1):
+                result = await finished
+                if result is not None:
                     results.append(result)
-                    
-                    self.log(f"Evaluation {idx} completed - ID: {trans_id}, Quality: {result.preprocessing_quality}, Confidence: {result.confidence:.2f}")
-                    
-                except Exception as e:
-                    error = EvaluationError(
-                        error_type="EvaluationError",
-                        message=str(e),
-                        timestamp=datetime.now().isoformat(),
-                        context={"pair_index": idx, "total_pairs": total_pairs, "id": trans_obj.get("id", "unknown")}
-                    )
-                    self.log(f"Error evaluating pair {idx} (ID: {trans_obj.get('id', 'unknown')}): {error.message}")
-                    continue
+                self.log(f"Progress: {done}/{total_pairs} pairs finished")
             
             self.log(f"Evaluation completed: {len(results)}/{total_pairs} successful")
             
@@ -438,10 +615,13 @@ class AIJudge(Logger):
             )
             self.log(f"Critical error in evaluation process: {error.message}")
             raise Exception(error.model_dump_json())
+        finally:
+            if self.executions is not None:
+                self.executions.close()
         
 if __name__ == "__main__":
     judge = AIJudge()
-    result = judge.evaluate()
+    result = asyncio.run(judge.evaluate())
     print("================================================")
     print(f"Total Evaluations Completed: {len(result)}")
     print("================================================")
\ No newline at end of file
@@ -1,21 +1,31 @@
 import os
+import re
+import bisect
+import hashlib
 import json
+import asyncio
 import sys
 from datetime import datetime
 from pathlib import Path
-from pydantic import BaseModel, Field
-import statistics
+from pydantic import BaseModel, Field, TypeAdapter
+from typing import List
+import threading
 from color import Logger
 import logging
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
-from core.preprocessor import Preprocessor
+from core.preprocessor import Preprocessor, PreprocessReport
 
 logging.basicConfig(
     level=logging.INFO,
     format='%(message)s'
 )
 
+FILLER_RE = re.compile(r"\b(?:um|uh|like|you know|basically|actually)\b", re.IGNORECASE)
+# Lower bound of each quality band; a score falls in the band of the last threshold it reaches
+QUALITY_THRESHOLDS = [0.0, 0.50, 0.75, 1.00, 1.10]
+QUALITY_LABELS = ["CRITICAL (Empty)", "BAD (Info Loss)", "OKAY (Aggressive)", "GOLDEN", "BAD (Stagnant)", "BAD (Hallucination)"]
+
 class PreprocessorEvaluationResult(BaseModel):
     """
     Stores evaluation metrics for a single preprocessing execution.
@@ -38,6 +48,10 @@ class TranscriptionInput(BaseModel):
     transcription: str
     timestamp: str
 
+TRANSCRIPTIONS_ADAPTER = TypeAdapter(List[TranscriptionInput])
+RESULTS_ADAPTER = TypeAdapter(List[PreprocessorEvaluationResult])
+READ_BUFFER_SIZE = 1 << 20
+
 class EvaluationPipeline(Logger):
     """
     Runs functional correctness evaluation for the preprocessor script.
@@ -47,15 +61,23 @@ class EvaluationPipeline(Logger):
     name = "PreprocessFunctionalEvaluation"
     color = Logger.WHITE
     
-    def __init__(self, transcriptions_path, preprocessor_script_path, output_dir):
+    def __init__(self, transcriptions_path, preprocessor_script_path, output_dir, max_concurrency=4):
         """
         Initialize evaluation pipeline with paths and setup output directory.
+        max_concurrency transcriptions are evaluated at once, since each run mostly waits on the LLM.
         """
         self.transcriptions_path = transcriptions_path
+        self.max_concurrency = max_concurrency
         self.preprocessor_script_path = preprocessor_script_path
         self.output_dir = output_dir or str(Path(__file__).parent)
         self.results_file = os.path.join(self.output_dir, "functional_executions.json")
         self.summary_file = os.path.join(self.output_dir, "functional_evaluation_summary.md")
+        self.preprocessed_index = {}
+        self.db_offset = 0
+        self.index_lock = threading.Lock()
+        self.preprocessor = Preprocessor()
+        # Read back the file the preprocessor writes to, which honours VOXFLOW_DB_DIR
+        self.db_path = self.preprocessor.db_file
         os.makedirs(self.output_dir, exist_ok=True)
         self.log("Evaluation pipeline initialized")
         
@@ -63,102 +85,68 @@ class EvaluationPipeline(Logger):
         """
         Load all transcription objects from JSONL file.
         """
-        transcriptions = []
-        with open(self.transcriptions_path, 'r', encoding='utf-8') as f:
-            for line in f:
-                if line.strip():
-                    data = json.loads(line)
-                    transcriptions.append(TranscriptionInput(**data))
+        with open(self.transcriptions_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            transcriptions = TRANSCRIPTIONS_ADAPTER.validate_python([json.loads(line) for line in f if line.strip()])
         self.log(f"Loaded {len(transcriptions)} transcriptions")
         return transcriptions
     
-    def parse_logs(self, logs):
-        """
-        Extract metrics from preprocessor execution logs.
-        """
-        llm_retries = 0
-        chunk_count = 0
-        chunks_processed = 0
-        output_saved = False
-        
-        for line in logs.split('\n'):
-            if 'Attempt' in line and 'failed' in line:
-                llm_retries += 1
-            if 'Split transcription into' in line:
-                chunk_count = int(line.split('into')[1].split('chunks')[0].strip())
-            if 'Processing chunk' in line:
-                chunks_processed += 1
-            if 'saved to' in line:
-                output_saved = True
-        
-        chunk_completeness = chunks_processed == chunk_count if chunk_count > 0 else True
-        
-        return {
-            'llm_retries': llm_retries,
-            'chunk_completeness': chunk_completeness,
-            'output_existence': output_saved
-        }
-    
     def get_quality_label(self, quality_score):
         """
         Return quality label based on content quality score.
         """
-        if quality_score >= 1.10:
-            return "BAD (Hallucination)"
-        elif quality_score >= 1.00: 
-            return "BAD (Stagnant)"
-        elif quality_score >= 0.75:
-            return "GOLDEN"
-        elif quality_score >= 0.50:
-            return "OKAY (Aggressive)"
-        elif quality_score > 0.00:
-            return "BAD (Info Loss)"
-        else:
+        if quality_score <= 0.0:
             return "CRITICAL (Empty)"
+        return QUALITY_LABELS[bisect.bisect_right(QUALITY_THRESHOLDS, quality_score)]
     
     def calculate_content_quality(self, original_text, preprocessed_text):
         """
         Calculate quality score based on text transformation metrics.
         """
-        if not preprocessed_text:
-            return 0.0
-        
-        original_len = len(original_text)
-        preprocessed_len = len(preprocessed_text)
-        
-        if original_len == 0:
+        if not preprocessed_text or not original_text:
             return 0.0
         
-        compression_ratio = preprocessed_len / original_len
-        
-        filler_words = ['um', 'uh', 'like', 'you know', 'basically', 'actually']
-        filler_count = sum(preprocessed_text.lower().count(word) for word in filler_words)
+        compression_ratio = len(preprocessed_text) / len(original_text)
+        if compression_ratio > 1.0:
+            compression_ratio = 1.0
         
-        quality_score = min(1.0, compression_ratio) * (1 - min(0.5, filler_count / 100))
+        filler_count = len(FILLER_RE.findall(preprocessed_text))
+        filler_penalty = 0.5 if filler_count >= 50 else filler_count / 100
         
-        return round(quality_score, 3)
+        return round(compression_ratio * (1 - filler_penalty), 3)
     
-    def verify_output_file(self, session_id):
+    def refresh_index(self):
         """
-        Check if preprocessed output exists in the database file.
+        Index preprocessed outputs appended to the database since the last refresh.
         """
-        db_path = r"D:\Projects\audio_preprocessor\backend\databases\preprocessings.jsonl"
-        
-        if not os.path.exists(db_path):
-            return False, None
-        
-        with open(db_path, 'r', encoding='utf-8') as f:
-            for line in f:
+        if not os.path.exists(self.db_path):
+            return
+        
+        with open(self.db_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            f.seek(self.db_offset)
+            for line in iter(f.readline, b''):
+                if not line.endswith(b'\n'):
+                    break
+                self.db_offset = f.tell()
                 if line.strip():
                     data = json.loads(line)
-                    if data.get('id') == session_id:
-                        return True, data.get('preprocessed_transcription', '')
+                    self.preprocessed_index[data.get('id')] = data.get('preprocessed_transcription', '')
+    
+    def verify_output_file(self, session_id):
+        """
+        Check if preprocessed output exists in the database file.
+        Looks the id up in the in-memory index, reading only newly appended records on a miss.
+        """
+        with self.index_lock:
+            if session_id not in self.preprocessed_index:
+                self.refresh_index()
+            text = self.preprocessed_index.get(session_id)
         
-        return False, None
+        return text is not None, text
     
-    def run_preprocessor(self, transcription_obj):
+    async def run_preprocessor(self, transcription_obj):
         """
         Execute the preprocessor for a single transcription.
+        Returns the PreprocessReport it filled in and whether preprocessing succeeded.
         """
         input_data = {
             "id": transcription_obj.id,
@@ -166,27 +154,26 @@ class EvaluationPipeline(Logger):
             "transcription": transcription_obj.transcription
         }
         
+        report = PreprocessReport()
         try:
-            preprocessor = Preprocessor()
-            result = preprocessor.preprocess(input_data)
-            preprocessor.langfuse.flush()
+            await self.preprocessor.preprocess(input_data, report=report)
+            await asyncio.to_thread(self.preprocessor.db.flush)
             
-            return f"Processing completed for {transcription_obj.name}", True
+            return report, True
         
         except Exception as e:
-            return f"ERROR: {str(e)}", False
+            self.log(f"Preprocessing failed for {transcription_obj.name}: {str(e)}")
+            return report, False
     
-    def evaluate_single(self, transcription_obj):
+    async def evaluate_single(self, transcription_obj):
         """
         Run evaluation for a single transcription and return result.
         """
         self.log(f"Evaluating {transcription_obj.name} (ID: {transcription_obj.id})")
         
-        logs, success = self.run_preprocessor(transcription_obj)
-        
-        metrics = self.parse_logs(logs)
+        report, success = await self.run_preprocessor(transcription_obj)
         
-        output_exists, preprocessed_text = self.verify_output_file(transcription_obj.id)
+        output_exists, preprocessed_text = await asyncio.to_thread(self.verify_output_file, transcription_obj.id)
         
         content_quality = 0.0
         if preprocessed_text:
@@ -200,8 +187,8 @@ class EvaluationPipeline(Logger):
         result = PreprocessorEvaluationResult(
             id=transcription_obj.id,
             file_name=transcription_obj.name,
-            chunk_completeness=metrics['chunk_completeness'],
-            llm_retries=metrics['llm_retries'],
+            chunk_completeness=report.chunks_processed == report.chunk_count,
+            llm_retries=report.llm_retries,
             output_existence=output_exists,
             session_integrity=session_integrity,
             content_quality=content_quality,
@@ -216,10 +203,8 @@ class EvaluationPipeline(Logger):
         """
         Save all evaluation results to JSON file.
         """
-        results_data = [result.model_dump(mode='json') for result in results]
-        
-        with open(self.results_file, 'w', encoding='utf-8') as f:
-            json.dump(results_data, f, indent=2, default=str)
+        with open(self.results_file, 'wb') as f:
+            f.write(RESULTS_ADAPTER.dump_json(results, indent=2))
         
         self.log(f"Saved execution results to {self.results_file}")
     
@@ -228,16 +213,29 @@ class EvaluationPipeline(Logger):
         Generate markdown summary with statistics and insights.
         """
         total = len(results)
-        successful = sum(1 for r in results if r.session_integrity)
-        failed = total - successful
+        successful = 0
+        total_retries = 0
+        total_quality = 0.0
+        chunk_complete_count = 0
+        output_exists_count = 0
+        
+        for r in results:
+            successful += r.session_integrity
+            total_retries += r.llm_retries
+            total_quality += r.content_quality
+            chunk_complete_count += r.chunk_completeness
+            output_exists_count += r.output_existence
         
-        avg_retries = statistics.mean([r.llm_retries for r in results])
-        avg_quality = statistics.mean([r.content_quality for r in results])
+        failed = total - successful
         
-        chunk_complete_count = sum(1 for r in results if r.chunk_completeness)
-        output_exists_count = sum(1 for r in results if r.output_existence)
+        # An empty or fully resumed run still gets a summary, with zeroed rates
+        avg_retries = total_retries / total if total else 0.0
+        avg_quality = total_quality / total if total else 0.0
+        success_rate = successful / total * 100 if total else 0.0
+        chunk_complete_rate = chunk_complete_count / total * 100 if total else 0.0
+        output_exists_rate = output_exists_count / total * 100 if total else 0.0
         
-        summary = f"""# Preprocessor Evaluation Summary
+        parts = [f"""# Preprocessor Evaluation Summary
 
 **Generated:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 
@@ -250,7 +248,7 @@ class EvaluationPipeline(Logger):
 | Total Executions | {total} |
 | Successful | {successful} |
 | Failed | {failed} |
-| Success Rate | {(successful/total*100):.2f}% |
+| Success Rate | {success_rate:.2f}% |
 
 ---
 
@@ -260,8 +258,8 @@ class EvaluationPipeline(Logger):
 |--------|---------|
 | LLM Retries | {avg_retries:.2f} |
 | Content Quality Score | {avg_quality:.3f} |
-| Chunk Completeness Rate | {(chunk_complete_count/total*100):.2f}% |
-| Output Existence Rate | {(output_exists_count/total*100):.2f}% |
+| Chunk Completeness Rate | {chunk_complete_rate:.2f}% |
+| Output Existence Rate | {output_exists_rate:.2f}% |
 
 ---
 
@@ -269,7 +267,7 @@ class EvaluationPipeline(Logger):
 
 | File Name | ID | Retries | Quality | Label | Complete | Output | Status |
 |-----------|-----|---------|---------|-------|----------|--------|--------|
-"""
+"""]
         
         for result in results:
             status = "✅ Pass" if result.session_integrity else "❌ Fail"
@@ -277,17 +275,17 @@ class EvaluationPipeline(Logger):
             output = "✓" if result.output_existence else "✗"
             quality_label = self.get_quality_label(result.content_quality)
             
-            summary += f"| {result.file_name} | {result.id[:8]}... | {result.llm_retries} | {result.content_quality:.3f} | {quality_label} | {complete} | {output} | {status} |\n"
+            parts.append(f"| {result.file_name} | {result.id[:8]}... | {result.llm_retries} | {result.content_quality:.3f} | {quality_label} | {complete} | {output} | {status} |\n")
         
-        summary += f"""
+        parts.append(f"""
 ---
 
 ## Key Insights
 
 - **Average LLM Retries:** {avg_retries:.2f} retries per execution
 - **Quality Assessment:** Average content quality score is {avg_quality:.3f}
-- **Reliability:** {(chunk_complete_count/total*100):.1f}% of executions completed all chunks
-- **Data Persistence:** {(output_exists_count/total*100):.1f}% of outputs were successfully saved
+- **Reliability:** {chunk_complete_rate:.1f}% of executions completed all chunks
+- **Data Persistence:** {output_exists_rate:.1f}% of outputs were successfully saved
 
 ---
 
@@ -306,25 +304,61 @@ class EvaluationPipeline(Logger):
 
 ## Failure Analysis
 
-"""
+""")
         
         failures = [r for r in results if not r.session_integrity]
         if failures:
             for failure in failures:
-                summary += f"- **{failure.file_name}** (ID: {failure.id[:8]}...): "
+                parts.append(f"- **{failure.file_name}** (ID: {failure.id[:8]}...): ")
                 if not failure.output_existence:
-                    summary += "Output not saved. "
+                    parts.append("Output not saved. ")
                 if not failure.chunk_completeness:
-                    summary += "Incomplete chunk processing. "
-                summary += f"Retries: {failure.llm_retries}\n"
+                    parts.append("Incomplete chunk processing. ")
+                parts.append(f"Retries: {failure.llm_retries}\n")
         else:
-            summary += "No failures detected. All executions completed successfully.\n"
+            parts.append("No failures detected. All executions completed successfully.\n")
         
         with open(self.summary_file, 'w', encoding='utf-8') as f:
-            f.write(summary)
+            f.write("".join(parts))
         
         self.log(f"Saved evaluation summary to {self.summary_file}")
     
+    async def evaluate_all(self, transcriptions):
+        """
+        Evaluate all transcriptions on one event loop, at most max_concurrency at a time.
+        A transcription whose text already appeared earlier in the set waits for that first
+        run to finish, so its LLM calls are answered by the preprocessor's response cache
+        instead of racing the first run and paying for the same requests twice.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        async def guarded(transcription, first_run=None):
+            if first_run is not None:
+                await asyncio.wait([first_run])
+            async with semaphore:
+                return await self.evaluate_single(transcription)
+        
+        first_runs = {}
+        tasks = []
+        for transcription in transcriptions:
+            digest = hashlib.blake2b(transcription.transcription.encode("utf-8"), digest_size=16).digest()
+            task = asyncio.create_task(guarded(transcription, first_runs.get(digest)))
+            first_runs.setdefault(digest, task)
+            tasks.append(task)
+        
+        duplicates = len(tasks) - len(first_runs)
+        if duplicates:
+            self.log(f"{duplicates} transcriptions duplicate an earlier one and will reuse its cached LLM responses")
+        
+        return await asyncio.gather(*tasks)
+    
+    def close(self):
+        """
+        Drain the preprocessor's database writer and flush Langfuse once.
+        """
+        self.preprocessor.close()
+        self.preprocessor.langfuse.flush()
+    
     def run(self):
         """
         Execute the complete evaluation pipeline.
@@ -335,10 +369,10 @@ class EvaluationPipeline(Logger):
         
         transcriptions = self.load_transcriptions()
         
-        results = []
-        for transcription in transcriptions:
-            result = self.evaluate_single(transcription)
-            results.append(result)
+        try:
+            results = asyncio.run(self.evaluate_all(transcriptions))
+        finally:
+            self.close()
         
         self.save_results(results)
         self.generate_summary(results)
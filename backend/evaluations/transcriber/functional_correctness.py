@@ -1,15 +1,15 @@
+import os
 import sys
-import re
+import json
 import uuid
 import logging
 from pathlib import Path
 from datetime import datetime
-from io import StringIO
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from core.transcriber import Transcriber
+from core.transcriber import Transcriber, TranscriptionReport
 from color import Logger
 
 logging.basicConfig(
@@ -69,6 +69,9 @@ class TranscriptionEvaluationResult(BaseModel):
             return not self.success
 
 
+RESULT_ADAPTER = TypeAdapter(TranscriptionEvaluationResult)
+
+
 class EvaluationSummary(BaseModel):
     """Aggregate metrics across all test cases"""
     total_files: int
@@ -103,8 +106,19 @@ class TranscriptionFunctionalEvaluator(Logger):
         self.base_path = Path(__file__).parent.parent / "test_data" / "transcriber"
         self.results_file = Path(__file__).parent / "functional_evaluation_results.jsonl"
         self.summary_file = Path(__file__).parent / "functional_evaluation_summary.md"
-        self.db_path = Path(r"D:\Projects\audio_preprocessor\backend\databases\transcriptions.jsonl")
-        self.captured_logs = ""
+        self.db_path = Path(self.transcriber.db_file)
+        self.saved_ids = set()
+        self.db_offset = 0
+
+    @staticmethod
+    def list_files(directory):
+        """
+        Lists regular files in a directory, using the type cached in each directory entry instead of a stat per file
+        """
+        if not directory.is_dir():
+            return []
+        with os.scandir(directory) as entries:
+            return [Path(entry.path) for entry in entries if entry.is_file()]
 
     def load_test_files(self):
         """
@@ -114,8 +128,8 @@ class TranscriptionFunctionalEvaluator(Logger):
         valid_dir = self.base_path / "valids"
         invalid_dir = self.base_path / "invalids"
         
-        valid_files = [(file_path, True) for file_path in valid_dir.glob("*") if file_path.is_file()]
-        invalid_files = [(file_path, False) for file_path in invalid_dir.glob("*") if file_path.is_file()]
+        valid_files = [(file_path, True) for file_path in self.list_files(valid_dir)]
+        invalid_files = [(file_path, False) for file_path in self.list_files(invalid_dir)]
         
         self.log(f"Loaded {len(valid_files)} valid and {len(invalid_files)} invalid test files")
         return valid_files + invalid_files
@@ -132,57 +146,38 @@ class TranscriptionFunctionalEvaluator(Logger):
             return has_format_error
         return not has_format_error
 
-    def check_output_saved(self, transcription_id):
+    def refresh_saved_ids(self):
         """
-        Verifies that transcription was saved to the database
+        Adds the ids of transcriptions appended to the database since the last refresh
         """
-        if not transcription_id or not self.db_path.exists():
-            return False
+        if not self.db_path.exists():
+            return
         
-        with open(self.db_path, 'r', encoding='utf-8') as db_file:
-            return any(transcription_id in line for line in db_file)
+        with open(self.db_path, 'rb') as db_file:
+            db_file.seek(self.db_offset)
+            for line in iter(db_file.readline, b''):
+                if not line.endswith(b'\n'):
+                    break
+                self.db_offset = db_file.tell()
+                if line.strip():
+                    self.saved_ids.add(json.loads(line).get('id'))
 
-    def check_chunk_processing(self):
+    def check_output_saved(self, transcription_id):
         """
-        Verifies all audio chunks were successfully processed by comparing split vs completed counts
+        Verifies that transcription was saved to the database
         """
-        split_match = re.search(r"Audio split into (\d+) valid chunks", self.captured_logs)
-        if not split_match:
+        if not transcription_id:
             return False
         
-        expected_chunks = int(split_match.group(1))
-        completed_chunks = len(re.findall(r"Completed chunk \d+/\d+", self.captured_logs))
-        
-        return expected_chunks == completed_chunks
-
-    def count_retries(self):
-        """
-        Counts retry attempts from captured logs
-        """
-        return len(re.findall(r"Retry \d+/\d+", self.captured_logs))
-
-    def extract_errors_from_logs(self, task_id, file_name):
-        """
-        Extracts error information from captured logs
-        """
-        errors = []
-        error_patterns = [
-            r"Retry \d+/\d+.*",
-            r"Error in chunk \d+.*",
-            r"Failed to.*",
-            r"WARNING:.*"
-        ]
-        
-        for pattern in error_patterns:
-            for match in re.findall(pattern, self.captured_logs):
-                errors.append(ErrorMessage(
-                    id=task_id,
-                    file_name=file_name,
-                    error_message=match.strip(),
-                    timestamp=datetime.now()
-                ))
-        
-        return errors
+        if transcription_id not in self.saved_ids:
+            # The transcriber only queues the record; wait until its writer has flushed it
+            try:
+                self.transcriber.db.flush()
+            except OSError as e:
+                self.log(f"Transcription database write failed: {str(e)}")
+                return False
+            self.refresh_saved_ids()
+        return transcription_id in self.saved_ids
 
     def process_single_file(self, file_path, expected_valid):
         """
@@ -190,16 +185,13 @@ class TranscriptionFunctionalEvaluator(Logger):
         """
         self.log(f"Testing {file_path.name} (expected_valid={expected_valid})")
         
-        log_stream = StringIO()
-        log_handler = logging.StreamHandler(log_stream)
-        logging.getLogger().addHandler(log_handler)
-        
         task_id = str(uuid.uuid4())
         errors = []
         transcription = None
+        report = TranscriptionReport()
 
         try:
-            transcription = self.transcriber.transcribe(str(file_path))
+            transcription = self.transcriber.transcribe(str(file_path), report=report)
             self.log(f"Transcription completed for {file_path.name}")
         except Exception as exc:
             error_msg = f"CRITICAL: {str(exc)}"
@@ -211,10 +203,15 @@ class TranscriptionFunctionalEvaluator(Logger):
                 timestamp=datetime.now()
             ))
 
-        self.captured_logs = log_stream.getvalue()
-        logging.getLogger().removeHandler(log_handler)
-
-        errors.extend(self.extract_errors_from_logs(task_id, file_path.name))
+        errors.extend(
+            ErrorMessage(
+                id=task_id,
+                file_name=file_path.name,
+                error_message=message,
+                timestamp=datetime.now()
+            )
+            for message in report.errors
+        )
 
         result = TranscriptionEvaluationResult(
             id=task_id,
@@ -223,8 +220,8 @@ class TranscriptionFunctionalEvaluator(Logger):
             input_validation_passed=self.check_input_validation(expected_valid, errors),
             transcription_completed=transcription is not None,
             output_saved=self.check_output_saved(transcription.id if transcription else None),
-            all_chunks_processed=self.check_chunk_processing() if expected_valid else True,
-            retry_count=self.count_retries(),
+            all_chunks_processed=report.decoded if expected_valid else True,
+            retry_count=report.retries,
             errors=errors
         )
         
@@ -243,25 +240,30 @@ class TranscriptionFunctionalEvaluator(Logger):
         Generates aggregate metrics from evaluation results
         """
         total = len(results)
-        valid_results = [r for r in results if r.expected_valid]
-        invalid_results = [r for r in results if not r.expected_valid]
+        valid_count = invalid_count = 0
+        valid_successes = invalid_rejections = 0
+        input_validation_correct = completed = saved = chunks_ok = 0
+        total_retries = unexpected_failures = expected_rejections = total_errors = 0
         
-        valid_count = len(valid_results)
-        invalid_count = len(invalid_results)
-        
-        overall_successes = sum(1 for r in results if r.success)
-        valid_successes = sum(1 for r in valid_results if r.success)
-        invalid_rejections = sum(1 for r in invalid_results if r.success)
-        
-        input_validation_correct = sum(1 for r in results if r.input_validation_passed)
-        completed = sum(1 for r in valid_results if r.transcription_completed)
-        saved = sum(1 for r in valid_results if r.output_saved)
-        chunks_ok = sum(1 for r in valid_results if r.all_chunks_processed)
+        for r in results:
+            success = r.success
+            if r.expected_valid:
+                valid_count += 1
+                valid_successes += success
+                completed += r.transcription_completed
+                saved += r.output_saved
+                chunks_ok += r.all_chunks_processed
+                unexpected_failures += not success
+            else:
+                invalid_count += 1
+                invalid_rejections += success
+                expected_rejections += r.input_validation_passed
+                unexpected_failures += not r.input_validation_passed
+            input_validation_correct += r.input_validation_passed
+            total_retries += r.retry_count
+            total_errors += len(r.errors)
         
-        total_retries = sum(r.retry_count for r in results)
-        unexpected_failures = sum(1 for r in results if r.is_unexpected_failure)
-        expected_rejections = sum(1 for r in results if r.is_expected_rejection)
-        total_errors = sum(len(r.errors) for r in results)
+        overall_successes = valid_successes + invalid_rejections
         
         summary = EvaluationSummary(
             total_files=total,
@@ -290,9 +292,8 @@ class TranscriptionFunctionalEvaluator(Logger):
         """
         self.log(f"Saving {len(results)} results to {self.results_file}")
         
-        with open(self.results_file, "w", encoding="utf-8") as output_file:
-            for result in results:
-                output_file.write(result.model_dump_json() + "\n")
+        with open(self.results_file, "wb", buffering=1 << 20) as output_file:
+            output_file.writelines(RESULT_ADAPTER.dump_json(result) + b"\n" for result in results)
         
         self.log(f"Results saved to {self.results_file}")
 
@@ -1,7 +1,8 @@
-import jsonlines
+import json
+from functools import lru_cache
 from datetime import datetime
 from pydantic import BaseModel, Field
-from jiwer import Compose, ToLowerCase, RemovePunctuation, RemoveMultipleSpaces, Strip, wer, cer
+from jiwer import Compose, ToLowerCase, RemovePunctuation, RemoveMultipleSpaces, Strip, process_words, process_characters
 from color import Logger
 from pathlib import Path
 import logging 
@@ -11,6 +12,24 @@ logging.basicConfig(
     format='%(message)s'
 )
 
+READ_BUFFER_SIZE = 1 << 20
+
+TEXT_NORMALIZER = Compose([
+    ToLowerCase(),
+    RemovePunctuation(),
+    RemoveMultipleSpaces(),
+    Strip()
+])
+
+
+def read_jsonl(path):
+    """
+    Parse every non-empty line of a JSONL file into a dict.
+    """
+    with open(path, 'rb', buffering=READ_BUFFER_SIZE) as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
 class NormalizedObject(BaseModel):
     """
     Represents a normalized transcription-reference pair.
@@ -55,17 +74,15 @@ class Normalizer(Logger):
         """
         Initialize the Normalizer with file paths and preprocessing pipeline.
         
-        Sets up the jiwer text normalization pipeline consisting of lowercase
+        Binds the shared jiwer text normalization pipeline consisting of lowercase
         conversion, punctuation removal, multiple space removal, and stripping.
+        The pipeline is memoized because references are often shared by many
+        transcriptions of the same prompt.
         """
         self.transcriptions_path = r"D:\Projects\audio_preprocessor\backend\evaluations\transcriber\transcriptions_data.jsonl"
         self.reference_path = r"D:\Projects\audio_preprocessor\backend\evaluations\transcriber\transcriptions_reference_data.jsonl"
-        self.normalizer = Compose([
-            ToLowerCase(),
-            RemovePunctuation(),
-            RemoveMultipleSpaces(),
-            Strip()
-        ])
+        self.normalizer = TEXT_NORMALIZER
+        self.normalize_text = lru_cache(maxsize=4096)(self.normalizer)
         self.log("Normalizer initialized with text preprocessing pipeline")
 
     def load_transcriptions(self):
@@ -76,8 +93,7 @@ class Normalizer(Logger):
             list: List of transcription objects loaded from the JSONL file
         """
         self.log(f"Loading transcriptions from: {self.transcriptions_path}")
-        with jsonlines.open(self.transcriptions_path) as reader:
-            transcriptions = [obj for obj in reader]
+        transcriptions = read_jsonl(self.transcriptions_path)
         self.log(f"Successfully loaded {len(transcriptions)} transcriptions")
         return transcriptions
 
@@ -89,8 +105,7 @@ class Normalizer(Logger):
             list: List of reference objects loaded from the JSONL file
         """
         self.log(f"Loading references from: {self.reference_path}")
-        with jsonlines.open(self.reference_path) as reader:
-            references = [obj for obj in reader]
+        references = read_jsonl(self.reference_path)
         self.log(f"Successfully loaded {len(references)} references")
         return references
 
@@ -112,19 +127,20 @@ class Normalizer(Logger):
         self.log("Starting normalization process")
         normalized_pairs: list[NormalizedObject] = []
         reference_by_name = {reference["name"]: reference for reference in references}
+        missing_references = 0
         
         for transcription_obj in transcriptions:
             file_name = transcription_obj["name"]
             if file_name not in reference_by_name:
-                self.log(f"No reference found for transcription: {file_name}")
+                missing_references += 1
                 continue
             
             reference_obj = reference_by_name[file_name]
             raw_transcription = transcription_obj["transcription"]
             raw_reference = reference_obj["transcription"]
             
-            normalized_transcription = self.normalizer(raw_transcription)
-            normalized_reference = self.normalizer(raw_reference)
+            normalized_transcription = self.normalize_text(raw_transcription)
+            normalized_reference = self.normalize_text(raw_reference)
             
             normalized_pairs.append(
                 NormalizedObject(
@@ -135,6 +151,8 @@ class Normalizer(Logger):
                 )
             )
         
+        if missing_references:
+            self.log(f"No reference found for {missing_references} transcriptions")
         self.log(f"Normalization complete: {len(normalized_pairs)} pairs processed")
         return normalized_pairs
 
@@ -150,13 +168,17 @@ class LexicalEvaluator(Logger):
     name = "lexical_evaluator"
     color = Logger.CYAN
 
-    def __init__(self):
+    def __init__(self, verbose=False):
         """
         Initialize the LexicalEvaluator with output paths.
         
         Sets up output directory and file paths for storing evaluation
         results and summary reports.
+        
+        Args:
+            verbose (bool, optional): Log the metrics of every pair. Defaults to False
         """
+        self.verbose = verbose
         self.output_directory = Path(r"D:\Projects\audio_preprocessor\backend\evaluations\transcriber")
         self.results_path = self.output_directory / "lexical_evaluations_result.jsonl"
         self.summary_path = self.output_directory / "lexical_evaluation_summary.md"
@@ -184,13 +206,40 @@ class LexicalEvaluator(Logger):
         if len(reference_tokens) < ngram_size or len(hypothesis_tokens) < ngram_size:
             return 0.0
         
-        reference_ngrams = set(tuple(reference_tokens[i:i+ngram_size]) for i in range(len(reference_tokens)-ngram_size+1))
-        hypothesis_ngrams = set(tuple(hypothesis_tokens[i:i+ngram_size]) for i in range(len(hypothesis_tokens)-ngram_size+1))
+        reference_ngrams = set(zip(*(reference_tokens[i:] for i in range(ngram_size))))
+        hypothesis_ngrams = set(zip(*(hypothesis_tokens[i:] for i in range(ngram_size))))
         
-        intersection = reference_ngrams.intersection(hypothesis_ngrams)
-        union = reference_ngrams.union(hypothesis_ngrams)
+        intersection_size = len(reference_ngrams & hypothesis_ngrams)
+        union_size = len(reference_ngrams) + len(hypothesis_ngrams) - intersection_size
         
-        return len(intersection)/len(union) if union else 0.0
+        return intersection_size/union_size if union_size else 0.0
+
+    @staticmethod
+    def error_rates(output):
+        """
+        Split a batched jiwer alignment output into one error rate per pair.
+        
+        jiwer only reports the corpus-level rate for a batch, so the
+        substitutions, deletions and insertions of each pair are counted from
+        its alignment chunks and divided by that pair's reference length,
+        which is exactly what wer()/cer() return for a single pair.
+        
+        Args:
+            output: WordOutput from process_words or CharacterOutput from process_characters
+            
+        Returns:
+            list[float]: Error rate of each pair, in input order
+        """
+        rates = []
+        for reference, alignment in zip(output.references, output.alignments):
+            errors = 0
+            for chunk in alignment:
+                if chunk.type == "insert":
+                    errors += chunk.hyp_end_idx - chunk.hyp_start_idx
+                elif chunk.type != "equal":
+                    errors += chunk.ref_end_idx - chunk.ref_start_idx
+            rates.append(errors / len(reference))
+        return rates
 
     def determine_quality_label(self, wer_score, cer_score, ngram_score):
         """
@@ -230,14 +279,41 @@ class LexicalEvaluator(Logger):
         self.log(f"Starting evaluation of {len(normalized_pairs)} transcription pairs")
         results = []
         
-        for pair in normalized_pairs:
+        if not normalized_pairs:
+            return results
+        
+        # Identical texts score 0 and empty transcriptions score 1 on both rates,
+        # so only the remaining pairs are sent to the alignment
+        word_error_rates = [0.0] * len(normalized_pairs)
+        character_error_rates = [0.0] * len(normalized_pairs)
+        aligned_indices = []
+        for index, pair in enumerate(normalized_pairs):
+            if pair.transcription == pair.reference:
+                continue
+            if not pair.transcription:
+                word_error_rates[index] = character_error_rates[index] = 1.0
+                continue
+            aligned_indices.append(index)
+        
+        if aligned_indices:
+            references = [normalized_pairs[index].reference for index in aligned_indices]
+            hypotheses = [normalized_pairs[index].transcription for index in aligned_indices]
+            word_rates = self.error_rates(process_words(references, hypotheses))
+            character_rates = self.error_rates(process_characters(references, hypotheses))
+            for index, word_rate, character_rate in zip(aligned_indices, word_rates, character_rates):
+                word_error_rates[index] = word_rate
+                character_error_rates[index] = character_rate
+        
+        timestamp = datetime.now().isoformat()
+        label_counts = {"OK": 0, "Acceptable": 0, "Bad": 0}
+        
+        for pair, word_error_rate, character_error_rate in zip(normalized_pairs, word_error_rates, character_error_rates):
             transcription_text = pair.transcription
             reference_text = pair.reference
             
-            word_error_rate = wer(reference_text, transcription_text)
-            character_error_rate = cer(reference_text, transcription_text)
             ngram_score = self.compute_ngram_similarity(reference_text, transcription_text, ngram_size=2)
             quality_label = self.determine_quality_label(word_error_rate, character_error_rate, ngram_score)
+            label_counts[quality_label] += 1
             
             results.append(
                 LexicalMetrics(
@@ -247,12 +323,14 @@ class LexicalEvaluator(Logger):
                     cer=character_error_rate,
                     ngram=ngram_score,
                     quality_label=quality_label,
-                    timestamp=datetime.now().isoformat()
+                    timestamp=timestamp
                 )
             )
-            self.log(f"Evaluated {pair.file_name}: WER={word_error_rate:.4f}, CER={character_error_rate:.4f}, N-gram={ngram_score:.4f}, Quality={quality_label}")
+            if self.verbose:
+                self.log(f"Evaluated {pair.file_name}: WER={word_error_rate:.4f}, CER={character_error_rate:.4f}, N-gram={ngram_score:.4f}, Quality={quality_label}")
         
-        self.log(f"Evaluation complete: {len(results)} results generated")
+        label_summary = ", ".join(f"{label}={count}" for label, count in label_counts.items())
+        self.log(f"Evaluation complete: {len(results)} results generated ({label_summary})")
         return results
 
     def save_execution(self, results: list[LexicalMetrics]):
@@ -267,9 +345,8 @@ class LexicalEvaluator(Logger):
         """
         self.log(f"Saving results to: {self.results_path}")
         self.output_directory.mkdir(parents=True, exist_ok=True)
-        with jsonlines.open(self.results_path, mode='w') as writer:
-            for result in results:
-                writer.write(result.dict())
+        with open(self.results_path, 'wb', buffering=1 << 20) as file:
+            file.writelines(result.model_dump_json().encode('utf-8') + b'\n' for result in results)
         self.log(f"Successfully saved {len(results)} evaluation results")
 
     def generate_report(self, results: list[LexicalMetrics]):
@@ -290,19 +367,34 @@ class LexicalEvaluator(Logger):
             return
         
         total_count = len(results)
-        average_wer = sum(result.wer for result in results) / total_count
-        average_cer = sum(result.cer for result in results) / total_count
-        average_ngram = sum(result.ngram for result in results) / total_count
-        
-        min_wer = min(result.wer for result in results)
-        max_wer = max(result.wer for result in results)
-        min_cer = min(result.cer for result in results)
-        max_cer = max(result.cer for result in results)
-        min_ngram = min(result.ngram for result in results)
-        max_ngram = max(result.ngram for result in results)
-        
-        best_wer_file = min(results, key=lambda x: x.wer).file_name
-        worst_wer_file = max(results, key=lambda x: x.wer).file_name
+        first = results[0]
+        total_wer = total_cer = total_ngram = 0.0
+        min_wer = max_wer = first.wer
+        min_cer = max_cer = first.cer
+        min_ngram = max_ngram = first.ngram
+        best_wer_file = worst_wer_file = first.file_name
+        
+        for result in results:
+            wer, cer, ngram = result.wer, result.cer, result.ngram
+            total_wer += wer
+            total_cer += cer
+            total_ngram += ngram
+            if wer < min_wer:
+                min_wer, best_wer_file = wer, result.file_name
+            elif wer > max_wer:
+                max_wer, worst_wer_file = wer, result.file_name
+            if cer < min_cer:
+                min_cer = cer
+            elif cer > max_cer:
+                max_cer = cer
+            if ngram < min_ngram:
+                min_ngram = ngram
+            elif ngram > max_ngram:
+                max_ngram = ngram
+        
+        average_wer = total_wer / total_count
+        average_cer = total_cer / total_count
+        average_ngram = total_ngram / total_count
         
         sorted_results = sorted(results, key=lambda x: x.wer)
         
@@ -331,12 +423,14 @@ class LexicalEvaluator(Logger):
 | File Name | WER | CER | N-gram | Quality | Timestamp |
 |-----------|-----|-----|--------|--------|-----------|
 """
-        
-        for result in sorted_results:
-            report_content += f"| {result.file_name} | {result.wer:.4f} | {result.cer:.4f} | {result.ngram:.4f} | {result.quality_label} | {result.timestamp} |\n"
+        rows = [report_content]
+        rows.extend(
+            f"| {result.file_name} | {result.wer:.4f} | {result.cer:.4f} | {result.ngram:.4f} | {result.quality_label} | {result.timestamp} |\n"
+            for result in sorted_results
+        )
         
         with open(self.summary_path, 'w', encoding='utf-8') as file:
-            file.write(report_content)
+            file.write("".join(rows))
         
         self.log(f"Summary report generated successfully with {total_count} entries")
 
@@ -1,13 +1,22 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Optional, List
 import os
-from tempfile import NamedTemporaryFile
+import json
+import uuid
+import asyncio
+import hashlib
+from datetime import datetime
 import logging
 from contextlib import asynccontextmanager
 from core.transcriber import Transcriber, Transcription
 from core.preprocessor import Preprocessor, PreprocessedResult
+from core.jsonl_index import JsonlIndex
+from tools.email_sender import EmailSender, Email
+from tools.text_extracter import TextExtracter, ProcessedData
+from tools.translator import Translate
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +28,42 @@ logger = logging.getLogger(__name__)
 # Initialize the core components (singleton pattern)
 transcriber = Transcriber()
 preprocessor = Preprocessor()
+email_sender = EmailSender()
+text_extracter = TextExtracter()
+translator = Translate()
+
+# Whisper runs in worker threads; this bounds how many transcriptions share the
+# model (and its GPU memory) at once
+transcription_slots = asyncio.Semaphore(int(os.getenv("TRANSCRIPTION_SLOTS", 1)))
+
+# Uploads are transcribed from memory, so their size is capped
+MAX_AUDIO_BYTES = int(os.getenv("MAX_AUDIO_BYTES", 200 * 1024 * 1024))
+AUDIO_UPLOAD_PATHS = {"/transcribe/audio", "/transcribe-and-process/audio"}
+
+# Tasks for LLM and translation requests currently running, keyed by request_key
+inflight = {}
+
+def request_key(*parts):
+    """Digest identifying a request by its endpoint and inputs"""
+    return hashlib.blake2b("\0".join(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+async def coalesce(key, make_call):
+    """
+    Run make_call() once for every group of identical requests in flight.
+    Later callers with the same key await the first caller's task, and all of them
+    receive its result or exception. The task is shielded, so one client
+    disconnecting does not cancel the work the others are waiting for.
+    """
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(make_call())
+        inflight[key] = task
+        task.add_done_callback(lambda _: inflight.pop(key, None))
+    return await asyncio.shield(task)
+
+# id -> offset indexes over the databases for the retrieval endpoints
+transcription_index = JsonlIndex(transcriber.db_file)
+preprocessing_index = JsonlIndex(preprocessor.db_file)
 
 # ============================================================================
 # LIFESPAN EVENTS
@@ -29,10 +74,18 @@ async def lifespan(app: FastAPI):
     """Initialize services on startup and cleanup on shutdown"""
     # Startup
     logger.info("✅ Audio Preprocessor API is starting up...")
-    logger.info(f"✅ Transcriber loaded with model: base")
-    logger.info(f"✅ Preprocessor initialized")
+    logger.info("✅ Transcriber loaded with model: base")
+    logger.info("✅ Preprocessor initialized")
+    transcription_index.refresh()
+    preprocessing_index.refresh()
+    logger.info("✅ Indexed %s transcriptions and %s preprocessings", len(transcription_index.offsets), len(preprocessing_index.offsets))
     yield
     # Shutdown
+    for service in (preprocessor, transcriber, email_sender):
+        try:
+            service.close()
+        except OSError as e:
+            logger.error("❌ Failed to close %s: %s", type(service).__name__, e)
     logger.info("👋 Shutting down Audio Preprocessor API...")
 
 # ============================================================================
@@ -46,6 +99,30 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+def upload_too_large_detail():
+    """Error detail for an audio upload over MAX_AUDIO_BYTES"""
+    return {
+        "status": "❌ error",
+        "message": "Audio file too large",
+        "detail": f"Uploads are limited to {MAX_AUDIO_BYTES} bytes"
+    }
+
+def check_upload_size(file: UploadFile):
+    """Catch oversized uploads sent without a usable Content-Length (e.g. chunked)"""
+    if file.size is not None and file.size > MAX_AUDIO_BYTES:
+        raise HTTPException(status_code=413, detail=upload_too_large_detail())
+
+# Registered before CORS so that CORS wraps it and the 413 reaches browsers
+@app.middleware("http")
+async def limit_audio_uploads(request: Request, call_next):
+    """Reject audio uploads whose Content-Length is over the limit before the body is read"""
+    if request.url.path in AUDIO_UPLOAD_PATHS:
+        content_length = request.headers.get("content-length", "")
+        if content_length.isdigit() and int(content_length) > MAX_AUDIO_BYTES:
+            logger.error("❌ Rejected upload of %s bytes to %s", content_length, request.url.path)
+            return JSONResponse(status_code=413, content={"detail": upload_too_large_detail()})
+    return await call_next(request)
+
 # Configure CORS for frontend communication
 app.add_middleware(
     CORSMiddleware,
@@ -143,23 +220,28 @@ class TranslationResponse(BaseModel):
 # HEALTH CHECK ENDPOINT
 # ============================================================================
 
+# Static bodies, encoded once the way FastAPI's JSONResponse would encode them
+ROOT_RESPONSE = json.dumps({
+    "status": "✅ success",
+    "service": "Audio Preprocessor API",
+    "version": "1.0.0"
+}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+HEALTH_RESPONSE = json.dumps({
+    "status": "✅ success",
+    "transcriber": "✅ ready",
+    "preprocessor": "✅ ready"
+}, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
-    return {
-        "status": "✅ success",
-        "service": "Audio Preprocessor API",
-        "version": "1.0.0"
-    }
+    return Response(content=ROOT_RESPONSE, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
     """Detailed health check"""
-    return {
-        "status": "✅ success",
-        "transcriber": "✅ ready",
-        "preprocessor": "✅ ready"
-    }
+    return Response(content=HEALTH_RESPONSE, media_type="application/json")
 
 # ============================================================================
 # TRANSCRIPTION ENDPOINTS
@@ -174,27 +256,24 @@ async def transcribe_audio_file(file: UploadFile = File(...)):
     - Returns: Transcription object with status
     """
     try:
-        logger.info(f"Received audio file: {file.filename}")
+        logger.info("Received audio file: %s", file.filename)
         
         # Validate file
         if not file.filename:
             raise HTTPException(status_code=400, detail="No filename provided")
+        check_upload_size(file)
         
-        # Save uploaded file to temporary location
-        suffix = os.path.splitext(file.filename)[1]
-        with NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
+        # Decode straight from the uploaded bytes, no temporary file needed
+        content = await file.read()
         
-        logger.info(f"Saved to temporary file: {temp_path}")
+        # Transcribe using your Transcriber class, off the event loop
+        async with transcription_slots:
+            transcription_obj = await asyncio.to_thread(transcriber.transcribe_bytes, file.filename, content)
         
-        # Transcribe using your Transcriber class
-        transcription_obj = transcriber.transcribe(temp_path)
+        # The record is only queued; make it readable before the client can ask for it
+        await asyncio.to_thread(transcriber.db.flush)
         
-        # Clean up temporary file
-        os.unlink(temp_path)
-        logger.info(f"✅ Transcription completed for: {file.filename}")
+        logger.info("✅ Transcription completed for: %s", file.filename)
         
         return TranscriptionResponse(
             status="✅ success",
@@ -202,8 +281,10 @@ async def transcribe_audio_file(file: UploadFile = File(...)):
             data=transcription_obj
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Error transcribing audio: {str(e)}")
+        logger.error("❌ Error transcribing audio: %s", e)
         raise HTTPException(
             status_code=500, 
             detail={
@@ -222,10 +303,7 @@ async def transcribe_direct_text(input_data: DirectTextInput):
     - Returns: Transcription object with status
     """
     try:
-        logger.info(f"Received direct text input: {input_data.name}")
-        
-        from datetime import datetime
-        import uuid
+        logger.info("Received direct text input: %s", input_data.name)
         
         # Create transcription object directly
         transcription_obj = Transcription(
@@ -235,17 +313,13 @@ async def transcribe_direct_text(input_data: DirectTextInput):
             timestamp=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         )
         
-        # Save to database
-        db_path = r"D:\Projects\audio_preprocessor\backend\databases"
-        jsonl_file = os.path.join(db_path, "transcriptions.jsonl")
-        os.makedirs(db_path, exist_ok=True)
-        
-        with open(jsonl_file, 'a', encoding='utf-8') as f:
-            f.write(transcription_obj.model_dump_json() + '\n')
-            f.flush()
-            os.fsync(f.fileno())
+        # Save to database through the transcriber's group-commit writer,
+        # which shares one file handle and batches fsyncs across requests,
+        # and wait until the record is readable before responding
+        transcriber.db.write_serialized(transcription_obj.model_dump_json().encode('utf-8'))
+        await asyncio.to_thread(transcriber.db.flush)
         
-        logger.info(f"✅ Direct text saved as transcription: {transcription_obj.id}")
+        logger.info("✅ Direct text saved as transcription: %s", transcription_obj.id)
         
         return TranscriptionResponse(
             status="✅ success",
@@ -254,7 +328,7 @@ async def transcribe_direct_text(input_data: DirectTextInput):
         )
         
     except Exception as e:
-        logger.error(f"❌ Error saving direct text: {str(e)}")
+        logger.error("❌ Error saving direct text: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -277,7 +351,7 @@ async def process_transcription(request: ProcessRequest):
     - Returns: PreprocessedResult object with status
     """
     try:
-        logger.info(f"Processing transcription ID: {request.id}")
+        logger.info("Processing transcription ID: %s", request.id)
         
         # Convert request to dict for preprocessor
         input_data = {
@@ -287,9 +361,14 @@ async def process_transcription(request: ProcessRequest):
         }
         
         # Process using your Preprocessor class
-        preprocessed_obj = preprocessor.preprocess(input_data)
+        # Identical requests in flight share a single preprocessing run
+        preprocessed_obj = await coalesce(
+            request_key("process", request.id, request.name, request.transcription),
+            lambda: preprocessor.preprocess(input_data)
+        )
+        await asyncio.to_thread(preprocessor.db.flush)
         
-        logger.info(f"✅ Processing completed for ID: {request.id}")
+        logger.info("✅ Processing completed for ID: %s", request.id)
         
         return PreprocessingResponse(
             status="✅ success",
@@ -298,7 +377,7 @@ async def process_transcription(request: ProcessRequest):
         )
         
     except Exception as e:
-        logger.error(f"❌ Error processing transcription: {str(e)}")
+        logger.error("❌ Error processing transcription: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -321,13 +400,7 @@ async def send_email(request: EmailRequest):
     - Returns: Email sending status
     """
     try:
-        logger.info(f"Sending email to: {request.to}")
-        
-        # Import the EmailSender class
-        from tools.email_sender import EmailSender, Email
-        
-        # Create email sender instance
-        email_sender = EmailSender()
+        logger.info("Sending email to: %s", request.to)
         
         # Create email object
         email_data = Email(
@@ -341,7 +414,7 @@ async def send_email(request: EmailRequest):
         # Send email
         result = email_sender.send_email(email_data)
         
-        logger.info(f"✅ Email sent successfully to: {request.to}")
+        logger.info("✅ Email sent successfully to: %s", request.to)
         
         return EmailResponse(
             status="✅ success",
@@ -350,7 +423,7 @@ async def send_email(request: EmailRequest):
         )
         
     except Exception as e:
-        logger.error(f"❌ Error sending email: {str(e)}")
+        logger.error("❌ Error sending email: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -371,19 +444,17 @@ async def extract_text(request: TextExtractionRequest):
     try:
         logger.info("Extracting keywords and keypoints from processed data")
         
-        # Import the TextExtracter class
-        from tools.text_extracter import TextExtracter, ProcessedData
-        
-        # Create text extracter instance
-        text_extracter = TextExtracter()
-        
         # Create processed data object
         processed_data = ProcessedData(processed_data=request.processed_data)
         
         # Extract keywords and keypoints
-        extraction_result = text_extracter.extract(processed_data.processed_data)
+        # Identical requests in flight share one LLM call, made off the event loop
+        extraction_result = await coalesce(
+            request_key("extract", processed_data.processed_data),
+            lambda: asyncio.to_thread(text_extracter.extract, processed_data.processed_data)
+        )
         
-        logger.info(f"✅ Text extraction completed")
+        logger.info("✅ Text extraction completed")
         
         return TextExtractionResponse(
             status="✅ success",
@@ -395,7 +466,7 @@ async def extract_text(request: TextExtractionRequest):
         )
         
     except Exception as e:
-        logger.error(f"❌ Error extracting text: {str(e)}")
+        logger.error("❌ Error extracting text: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -414,21 +485,16 @@ async def translate_text(request: TranslationRequest):
     - Returns: Translated text
     """
     try:
-        logger.info(f"Translating text to language: {request.language}")
-        
-        # Import the Translate class
-        from tools.translator import Translate
-        
-        # Create translator instance
-        translator = Translate()
+        logger.info("Translating text to language: %s", request.language)
         
         # Translate text
-        translation_result = translator.translate(
-            language=request.language,
-            data=request.processed_data
+        # Identical requests in flight share one translation, made off the event loop
+        translation_result = await coalesce(
+            request_key("translate", request.language, request.processed_data),
+            lambda: asyncio.to_thread(translator.translate, language=request.language, data=request.processed_data)
         )
         
-        logger.info(f"✅ Translation completed")
+        logger.info("✅ Translation completed")
         
         return TranslationResponse(
             status="✅ success",
@@ -437,7 +503,7 @@ async def translate_text(request: TranslationRequest):
         )
         
     except Exception as e:
-        logger.error(f"❌ Error translating text: {str(e)}")
+        logger.error("❌ Error translating text: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -459,16 +525,13 @@ async def transcribe_and_process_audio(file: UploadFile = File(...)):
     """
     try:
         # Step 1: Transcribe
-        logger.info(f"Starting combined workflow for: {file.filename}")
+        logger.info("Starting combined workflow for: %s", file.filename)
         
-        suffix = os.path.splitext(file.filename)[1]
-        with NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            content = await file.read()
-            temp_file.write(content)
-            temp_path = temp_file.name
+        check_upload_size(file)
+        content = await file.read()
         
-        transcription_obj = transcriber.transcribe(temp_path)
-        os.unlink(temp_path)
+        async with transcription_slots:
+            transcription_obj = await asyncio.to_thread(transcriber.transcribe_bytes, file.filename, content)
         
         # Step 2: Process
         input_data = {
@@ -477,9 +540,13 @@ async def transcribe_and_process_audio(file: UploadFile = File(...)):
             "transcription": transcription_obj.transcription
         }
         
-        preprocessed_obj = preprocessor.preprocess(input_data)
+        preprocessed_obj = await preprocessor.preprocess(input_data)
+        
+        # Both records are only queued; make them readable before responding
+        await asyncio.to_thread(transcriber.db.flush)
+        await asyncio.to_thread(preprocessor.db.flush)
         
-        logger.info(f"✅ Combined workflow completed for: {file.filename}")
+        logger.info("✅ Combined workflow completed for: %s", file.filename)
         
         return CombinedResponse(
             status="✅ success",
@@ -488,8 +555,10 @@ async def transcribe_and_process_audio(file: UploadFile = File(...)):
             preprocessed=preprocessed_obj
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"❌ Error in combined workflow: {str(e)}")
+        logger.error("❌ Error in combined workflow: %s", e)
         raise HTTPException(
             status_code=500,
             detail={
@@ -507,10 +576,7 @@ async def transcribe_and_process_audio(file: UploadFile = File(...)):
 async def get_transcription(transcription_id: str):
     """Retrieve a specific transcription by ID"""
     try:
-        db_path = r"D:\Projects\audio_preprocessor\backend\databases"
-        jsonl_file = os.path.join(db_path, "transcriptions.jsonl")
-        
-        if not os.path.exists(jsonl_file):
+        if not os.path.exists(transcription_index.db_file):
             raise HTTPException(
                 status_code=404,
                 detail={
@@ -519,16 +585,13 @@ async def get_transcription(transcription_id: str):
                 }
             )
         
-        with open(jsonl_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                import json
-                obj = json.loads(line)
-                if obj.get('id') == transcription_id:
-                    return {
-                        "status": "✅ success",
-                        "message": "Transcription retrieved successfully",
-                        "data": obj
-                    }
+        obj = transcription_index.get(transcription_id)
+        if obj is not None:
+            return {
+                "status": "✅ success",
+                "message": "Transcription retrieved successfully",
+                "data": obj
+            }
         
         raise HTTPException(
             status_code=404,
@@ -554,10 +617,7 @@ async def get_transcription(transcription_id: str):
 async def get_preprocessing(preprocessing_id: str):
     """Retrieve a specific preprocessed result by ID"""
     try:
-        db_path = r"D:\Projects\audio_preprocessor\backend\databases"
-        jsonl_file = os.path.join(db_path, "preprocessings.jsonl")
-        
-        if not os.path.exists(jsonl_file):
+        if not os.path.exists(preprocessing_index.db_file):
             raise HTTPException(
                 status_code=404,
                 detail={
@@ -566,16 +626,13 @@ async def get_preprocessing(preprocessing_id: str):
                 }
             )
         
-        with open(jsonl_file, 'r', encoding='utf-8') as f:
-            for line in f:
-                import json
-                obj = json.loads(line)
-                if obj.get('id') == preprocessing_id:
-                    return {
-                        "status": "✅ success",
-                        "message": "Preprocessing retrieved successfully",
-                        "data": obj
-                    }
+        obj = preprocessing_index.get(preprocessing_id)
+        if obj is not None:
+            return {
+                "status": "✅ success",
+                "message": "Preprocessing retrieved successfully",
+                "data": obj
+            }
         
         raise HTTPException(
             status_code=404,
@@ -603,10 +660,15 @@ async def get_preprocessing(preprocessing_id: str):
 
 if __name__ == "__main__":
     import uvicorn
+    # Each worker loads its own Whisper model and database writers, so scale
+    # out with WORKERS only when memory allows; DEV=1 enables the reloader
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,  
+        reload=os.getenv("DEV") == "1",
+        workers=int(os.getenv("WORKERS", 1)),
+        loop="auto",
+        http="auto",
         log_level="info"
     )
\ No newline at end of file
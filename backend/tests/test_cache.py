@@ -0,0 +1,52 @@
+from core.cache import ResponseCache
+
+
+def messages(content):
+    return [{"role": "system", "content": "Clean the transcription."}, {"role": "user", "content": content}]
+
+
+def test_near_key_ignores_whitespace():
+    assert ResponseCache.make_near_key("m", messages("we met in  Paris\n today")) == ResponseCache.make_near_key("m", messages("we met in Paris today "))
+
+
+def test_near_key_keeps_case_punctuation_and_digits():
+    assert ResponseCache.make_near_key("m", messages("we met in Paris")) != ResponseCache.make_near_key("m", messages("we met in paris"))
+    assert ResponseCache.make_near_key("m", messages("version 3.5")) != ResponseCache.make_near_key("m", messages("version 3 5"))
+
+
+def test_differently_cased_inputs_do_not_share_an_entry(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.set(ResponseCache.make_near_key("m", messages("we met in Paris")), "Paris")
+
+    assert cache.get(ResponseCache.make_near_key("m", messages("we met in paris"))) is None
+
+
+def test_exact_key_hit(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    key = ResponseCache.make_key("m", messages("we met in Paris"))
+    cache.set(key, '{"preprocessed_transcription":"We met in Paris."}')
+
+    assert cache.get(ResponseCache.make_key("m", messages("we met in Paris"))) == '{"preprocessed_transcription":"We met in Paris."}'
+    assert cache.get(ResponseCache.make_key("other", messages("we met in Paris"))) is None
+
+
+def test_near_key_hit_after_exact_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    stored = messages("we met in Paris")
+    cache.set_many([
+        (ResponseCache.make_key("m", stored), "exact"),
+        (ResponseCache.make_near_key("m", stored), "near")
+    ])
+
+    rewrapped = messages("we met\nin  Paris")
+    keys = (ResponseCache.make_key("m", rewrapped), ResponseCache.make_near_key("m", rewrapped))
+    assert cache.get(keys[0]) is None
+    assert cache.get_first(keys) == "near"
+    assert cache.get_first((ResponseCache.make_key("m", stored), ResponseCache.make_near_key("m", stored))) == "exact"
+
+
+def test_cache_persists_across_connections(tmp_path):
+    db_file = str(tmp_path / "cache.sqlite")
+    ResponseCache(db_file).set("key", "value")
+
+    assert ResponseCache(db_file).get("key") == "value"
@@ -0,0 +1,40 @@
+from core.jsonl_index import JsonlIndex, record_id
+
+
+def test_record_id_reads_plain_and_escaped_ids():
+    assert record_id(b'{"id":"abc","name":"x"}\n') == "abc"
+    assert record_id(b'{"id":"a\\"b"}\n') == 'a"b'
+    assert record_id(b'{"name":"x","id":"late"}\n') == "late"
+
+
+def test_get_returns_the_first_record_with_an_id(tmp_path):
+    db_file = tmp_path / "records.jsonl"
+    db_file.write_bytes(b'{"id":"a","v":1}\n{"id":"b","v":2}\n{"id":"a","v":3}\n')
+    index = JsonlIndex(str(db_file))
+
+    assert index.get("a") == {"id": "a", "v": 1}
+    assert index.get("b") == {"id": "b", "v": 2}
+    assert index.get("missing") is None
+
+
+def test_torn_tail_line_is_skipped_until_complete(tmp_path):
+    db_file = tmp_path / "records.jsonl"
+    db_file.write_bytes(b'{"id":"a"}\n{"id":"b","text":"half')
+    index = JsonlIndex(str(db_file))
+    index.refresh()
+
+    assert index.get("a") == {"id": "a"}
+    assert index.get("b") is None
+    assert index.indexed_offset == len(b'{"id":"a"}\n')
+
+    with open(db_file, "ab") as f:
+        f.write(b' done"}\n')
+
+    assert index.get("b") == {"id": "b", "text": "half done"}
+
+
+def test_missing_file_is_empty(tmp_path):
+    index = JsonlIndex(str(tmp_path / "absent.jsonl"))
+    index.refresh()
+
+    assert index.get("a") is None
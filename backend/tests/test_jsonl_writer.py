@@ -0,0 +1,72 @@
+import json
+import pytest
+from core.jsonl_writer import JsonlWriter
+
+
+def read_lines(path):
+    with open(path, "rb") as f:
+        return f.read().splitlines()
+
+
+def test_flush_makes_queued_records_readable(tmp_path):
+    db_file = str(tmp_path / "records.jsonl")
+    writer = JsonlWriter(db_file)
+    try:
+        writer.write({"id": "a", "text": "héllo"})
+        writer.write_serialized(b'{"id":"b"}')
+        writer.flush()
+
+        assert [json.loads(line) for line in read_lines(db_file)] == [{"id": "a", "text": "héllo"}, {"id": "b"}]
+    finally:
+        writer.close()
+
+
+def test_close_drains_the_queue(tmp_path):
+    db_file = str(tmp_path / "records.jsonl")
+    writer = JsonlWriter(db_file, batch_size=4)
+    for idx in range(10):
+        writer.write({"id": str(idx)})
+    writer.close()
+
+    assert [json.loads(line)["id"] for line in read_lines(db_file)] == [str(idx) for idx in range(10)]
+    assert writer.closed
+
+
+def test_write_error_is_raised_once_from_flush(tmp_path, monkeypatch):
+    db_file = str(tmp_path / "records.jsonl")
+    writer = JsonlWriter(db_file)
+
+    def fail(data):
+        raise OSError(28, "No space left on device")
+
+    try:
+        monkeypatch.setattr(writer.file, "write", fail)
+        writer.write({"id": "lost"})
+        with pytest.raises(OSError, match="1 records were not written") as excinfo:
+            writer.flush()
+        assert isinstance(excinfo.value.__cause__, OSError)
+
+        monkeypatch.undo()
+        writer.write({"id": "kept"})
+        writer.flush()
+        assert read_lines(db_file) == [b'{"id":"kept"}']
+    finally:
+        writer.close()
+
+
+def test_write_error_is_raised_from_next_write_and_close(tmp_path, monkeypatch):
+    writer = JsonlWriter(str(tmp_path / "records.jsonl"))
+
+    def fail(data):
+        raise OSError(5, "Input/output error")
+
+    monkeypatch.setattr(writer.file, "write", fail)
+    writer.write({"id": "first"})
+    writer.queue.join()
+    with pytest.raises(OSError):
+        writer.write({"id": "second"})
+
+    writer.write({"id": "third"})
+    with pytest.raises(OSError):
+        writer.close()
+    assert writer.closed
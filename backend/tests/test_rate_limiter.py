@@ -0,0 +1,48 @@
+import time
+import asyncio
+from core.rate_limiter import RateLimiter
+
+
+def timed_acquires(limiter, *token_counts):
+    async def run():
+        start = time.monotonic()
+        for tokens in token_counts:
+            await limiter.acquire(tokens)
+            await limiter.release()
+        return time.monotonic() - start
+
+    return asyncio.run(run())
+
+
+def test_acquire_within_budget_does_not_wait():
+    limiter = RateLimiter(rpm=600, tpm=60000, max_concurrency=4)
+
+    assert timed_acquires(limiter, 100, 100, 100) < 0.1
+
+
+def test_acquire_waits_for_token_budget_to_refill():
+    # 6000 TPM refills 100 tokens per second, so 30 tokens after an empty bucket take ~0.3s
+    limiter = RateLimiter(rpm=600, tpm=6000, max_concurrency=4)
+
+    assert timed_acquires(limiter, 6000, 30) >= 0.25
+
+
+def test_oversized_request_is_capped_at_the_tpm_budget():
+    limiter = RateLimiter(rpm=600, tpm=1000, max_concurrency=4)
+
+    assert timed_acquires(limiter, 50000) < 0.1
+
+
+def test_acquire_waits_for_a_concurrency_slot():
+    limiter = RateLimiter(rpm=600, tpm=60000, max_concurrency=1)
+
+    async def run():
+        await limiter.acquire(10)
+        waiter = asyncio.create_task(limiter.acquire(10))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        await limiter.release()
+        await asyncio.wait_for(waiter, timeout=1)
+        await limiter.release()
+
+    asyncio.run(run())
@@ -1,6 +1,8 @@
 import os
 from pydantic import BaseModel, Field
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from color import Logger
 import logging 
 
@@ -22,12 +24,26 @@ class EmailSender(Logger):
 
     def __init__(self):
         self.url = "http://localhost:5678/webhook/66531120-ed67-4a06-b6a2-0a690273e957"
+        # One pooled session keeps the webhook connection alive between emails.
+        # Only failed connects are retried, so a slow webhook never sends twice.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=10,
+            pool_maxsize=20,
+            max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.1)
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
         self.log("Initialized EmailSender")
+
+    def close(self):
+        """Release the pooled webhook connections."""
+        self.session.close()
         
     def send_to_n8n(self, data):
         """Send data to n8n webhook with error handling."""
         try:
-            response = requests.post(self.url, json=data, timeout=30)
+            response = self.session.post(self.url, json=data, timeout=(3.05, 27))
             response.raise_for_status()
             result = response.json()
             
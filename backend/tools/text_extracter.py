@@ -1,4 +1,7 @@
 import os 
+import hashlib
+import threading
+from collections import OrderedDict
 from dotenv import load_dotenv
 from openai import OpenAI 
 from pydantic import BaseModel, Field 
@@ -17,6 +20,12 @@ url = os.getenv("OPENROUTER_URL")
 deepseek = os.getenv("DEEPSEEK_MODEL")
 gpt = os.getenv("GPT_MODEL")
 
+# Parsed extractions keyed by a digest of (model, processed_data), shared by every
+# TextExtracter in the process; the least recently used entry is evicted first
+EXTRACTION_CACHE = OrderedDict()
+EXTRACTION_CACHE_SIZE = 1024
+EXTRACTION_CACHE_LOCK = threading.Lock()
+
 class TextExtraction(BaseModel):
     keywords: List[str] = Field(
         description="A list of specific keywords found in the text, specifically focusing on terms related to the Rajya Sabha (e.g., Chairman, MP, Bill, Session).")
@@ -72,7 +81,19 @@ class TextExtracter(Logger):
         return [{"role": "system", "content": self.system_prompt},
                 {"role": "user", "content": self.user_prompt.format(processed_data=processed_data)}]
     
+    def cache_key(self, processed_data):
+        return hashlib.blake2b(f"{self.model}\0{processed_data}".encode("utf-8"), digest_size=16).hexdigest()
+
     def extract(self, processed_data: ProcessedData):
+        key = self.cache_key(processed_data)
+        with EXTRACTION_CACHE_LOCK:
+            cached = EXTRACTION_CACHE.get(key)
+            if cached is not None:
+                EXTRACTION_CACHE.move_to_end(key)
+        if cached is not None:
+            self.log("Extraction served from cache")
+            return cached
+
         self.log("Sending the processed data for extracttion")
         response = self.client.chat.completions.parse(model=self.model,
                                            messages=self.make_messages(processed_data),
@@ -81,6 +102,10 @@ class TextExtracter(Logger):
         parsed_obj = getattr(response.choices[0].message, 'parsed', None)
         if parsed_obj is not None:
             self.log(f"Extarction successfully finished with {len(parsed_obj.keywords)} keywords and {len(parsed_obj.keypoints)} keypoints")
+            with EXTRACTION_CACHE_LOCK:
+                EXTRACTION_CACHE[key] = parsed_obj
+                if len(EXTRACTION_CACHE) > EXTRACTION_CACHE_SIZE:
+                    EXTRACTION_CACHE.popitem(last=False)
             return parsed_obj
         else:
             unparsed_response = response.choices[0].message.content
@@ -1,3 +1,8 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pydantic import BaseModel
 from deep_translator import GoogleTranslator
 from color import Logger
@@ -8,6 +13,45 @@ logging.basicConfig(
     format='%(message)s'
 )
 
+# Translated chunks keyed by (target language, chunk digest), shared by every
+# Translate in the process; the least recently used entry is evicted first
+TRANSLATION_CACHE = OrderedDict()
+TRANSLATION_CACHE_SIZE = 4096
+TRANSLATION_CACHE_LOCK = threading.Lock()
+
+MAX_TRANSLATION_WORKERS = 8
+
+# Whitespace that follows sentence-ending punctuation, kept by split()
+SENTENCE_BOUNDARY_RE = re.compile(r'(?<=[.!?])(\s+)')
+
+
+def split_into_chunks(data: str, chunk_size: int):
+    """
+    Greedily pack whole sentences into chunks of at most chunk_size characters.
+    A sentence longer than chunk_size is cut at its last whitespace that fits,
+    and only a single word longer than chunk_size is cut mid-word. Every chunk
+    keeps the whitespace it ends with, so joining the chunks never splits a word.
+    """
+    pieces = SENTENCE_BOUNDARY_RE.split(data)
+    sentences = [piece + separator for piece, separator in zip(pieces[::2], pieces[1::2] + [""])]
+
+    chunks, current = [], ""
+    for sentence in sentences:
+        if len(current) + len(sentence) <= chunk_size:
+            current += sentence
+            continue
+        if current:
+            chunks.append(current)
+            current = ""
+        while len(sentence) > chunk_size:
+            cut = max(sentence.rfind(" ", 0, chunk_size), sentence.rfind("\n", 0, chunk_size)) + 1 or chunk_size
+            chunks.append(sentence[:cut])
+            sentence = sentence[cut:]
+        current = sentence
+    if current:
+        chunks.append(current)
+    return chunks
+
 
 # --- Schemas ---
 class TranslationInput(BaseModel):
@@ -21,20 +65,36 @@ class Translate(Logger):
     name = "Translator"
     color = Logger.WHITE
 
+    def translate_chunk(self, language: str, chunk: str):
+        """Translate one chunk, reusing it if it was translated before."""
+        key = (language, hashlib.blake2b(chunk.encode("utf-8"), digest_size=16).hexdigest())
+        with TRANSLATION_CACHE_LOCK:
+            translated = TRANSLATION_CACHE.get(key)
+            if translated is not None:
+                TRANSLATION_CACHE.move_to_end(key)
+                return translated
+
+        # GoogleTranslator keeps per-request state on the instance, so each
+        # concurrent chunk gets its own
+        translated = GoogleTranslator(source='auto', target=language).translate(chunk)
+        if translated is not None:
+            with TRANSLATION_CACHE_LOCK:
+                TRANSLATION_CACHE[key] = translated
+                if len(TRANSLATION_CACHE) > TRANSLATION_CACHE_SIZE:
+                    TRANSLATION_CACHE.popitem(last=False)
+        return translated
+
     def translate(self, language: str, data: str) -> TranslationOutput:
         try:
             self.log("Translating the data")
             
             # 1. Define chunk size (staying safe under the 5000 limit)
             CHUNK_SIZE = 4000 
-            chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
-            
-            translator = GoogleTranslator(source='auto', target=language)
-            translated_parts = []
+            chunks = split_into_chunks(data, CHUNK_SIZE)
 
-            # 2. Translate each chunk
-            for chunk in chunks:
-                translated_parts.append(translator.translate(chunk))
+            # 2. Translate the chunks concurrently, keeping their order
+            with ThreadPoolExecutor(max_workers=max(1, min(MAX_TRANSLATION_WORKERS, len(chunks)))) as pool:
+                translated_parts = list(pool.map(lambda chunk: self.translate_chunk(language, chunk), chunks))
             
             # 3. Join them back together
             full_translation = " ".join(translated_parts)